@@ -0,0 +1,259 @@
+import argparse
+import inspect
+import json
+import os
+import platform
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.synthetic import write_dataset
+
+
+# Times the graph functions of both pages, and full runs of each page through
+# Streamlit's AppTest, on synthetic data at each scale (see
+# benchmarks.synthetic), along with their peak traced memory. Results are
+# appended to --results (benchmarks/results.jsonl, which is not tracked) and
+# compared with the last run at the same scale on the same machine; anything
+# slower or larger than --tolerance is reported as a regression and fails the
+# run. The 100x scale takes minutes and gigabytes, so it only runs when asked
+# for
+#
+#   python -m benchmarks.pages [--scales 1 10 [100]] [--repeat N]
+#       [--tolerance T] [--results PATH]
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+RESULTS = ROOT_DIR / 'benchmarks' / 'results.jsonl'
+COUNTRY_PAGE = ROOT_DIR / 'pages' / '2_Country_Level_Statistics.py'
+GLOBAL_PAGE = ROOT_DIR / 'pages' / '1_Global_Statistics.py'
+
+
+# Best wall time of repeat calls, and the peak memory traced over one more
+def _measure(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': best, 'peak_bytes': peak}
+
+
+# A page's module-level data and functions, without running main()
+def _page_globals(path):
+    return runpy.run_path(str(path), run_name='benchmark')
+
+
+# A chart function without its figure cache and spans
+def _uncached(fn):
+    return inspect.unwrap(fn)
+
+
+def _graph_benchmarks(country_page, global_page):
+    country = country_page['country_store'].countries[0]
+    dates = country_page['country_cube'].dates
+    date = dates[int(len(dates) * 0.6)].to_pydatetime()
+
+    graph_area_country = _uncached(country_page['graph_area_country'])
+    graph_stacked_country_case = _uncached(country_page['graph_stacked_country_case'])
+    graph_country_dual = _uncached(country_page['graph_country_dual'])
+    graph_rank_country = _uncached(country_page['graph_rank_country'])
+    graph_bar_country = _uncached(country_page['graph_bar_country'])
+    graph_bar_race = _uncached(country_page['graph_bar_race'])
+    graph_scatter = _uncached(country_page['graph_scatter'])
+    hdi_dist = _uncached(country_page['hdi_dist'])
+    graph_area_global = global_page['graph_area_global']
+    graph_stacked_global_case = global_page['graph_stacked_global_case']
+
+    return {
+        'graph_area_country': lambda: graph_area_country(
+            country, 'cases', '#6f6fe7', 'Total Cases'
+        ),
+        'graph_area_country[webgl]': lambda: graph_area_country(
+            country, 'cases', '#6f6fe7', 'Total Cases', webgl=True
+        ),
+        'graph_stacked_country_case': lambda: graph_stacked_country_case(country),
+        'graph_country_dual': lambda: graph_country_dual(
+            country, 'new_cases_smoothed', 'stringency_value', 'Dual'
+        ),
+        'graph_rank_country': lambda: graph_rank_country(country, 'infection_rate'),
+        'graph_bar_country': lambda: graph_bar_country('infection_rate', date),
+        'graph_bar_race': lambda: graph_bar_race('infection_rate'),
+        'graph_scatter': lambda: graph_scatter(
+            'hdi_value', 'case_fatality_rate', date, log_y=True
+        ),
+        'hdi_dist': lambda: hdi_dist(date),
+        'graph_area_global': lambda: graph_area_global('cases', '#6f6fe7'),
+        'graph_stacked_global_case': graph_stacked_global_case,
+    }
+
+
+def _page_benchmarks():
+    from streamlit.testing.v1 import AppTest
+
+    import covid_data
+
+    benchmarks = {}
+    for name, path in [('global page', GLOBAL_PAGE), ('country page', COUNTRY_PAGE)]:
+        app = AppTest.from_file(str(path), default_timeout=600)
+
+        # A first run loads the data; later runs reuse it as reruns do, with
+        # the figure cache emptied so that every chart is rebuilt
+        def cold(app=app):
+            covid_data.clear_cache()
+            app.run()
+
+        def rerun(app=app):
+            covid_data.figure_cache.clear()
+            app.run()
+
+        benchmarks[f'{name} (cold)'] = cold
+        benchmarks[f'{name} (rerun)'] = rerun
+        benchmarks[f'{name} (cached figures)'] = app.run
+    return benchmarks
+
+
+# Runs in a child process with COVID_DATA_DIR pointing at the synthetic data
+def _run_benchmarks(repeat):
+    import covid_data
+
+    results = {}
+    for name, fn in _page_benchmarks().items():
+        results[name] = _measure(repeat, fn)
+
+    country_page = _page_globals(COUNTRY_PAGE)
+    global_page = _page_globals(GLOBAL_PAGE)
+    for name, fn in _graph_benchmarks(country_page, global_page).items():
+        results[name] = _measure(repeat, fn)
+
+    results['rows'] = len(covid_data.load_country(['cases']))
+    return results
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def _run_scale(scale, repeat):
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_dataset(data_dir, scale)
+        result = subprocess.run(
+            [
+                sys.executable,
+                '-m',
+                'benchmarks.pages',
+                '--child',
+                '--repeat',
+                str(repeat),
+            ],
+            cwd=ROOT_DIR,
+            env={**os.environ, 'COVID_DATA_DIR': data_dir},
+            capture_output=True,
+            text=True,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f'scale {scale} failed:\n{result.stderr}')
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def _previous_run(results_path, scale, machine):
+    if not results_path.exists():
+        return None
+    previous = None
+    for line in results_path.read_text().splitlines():
+        run = json.loads(line)
+        if run['scale'] == scale and run['machine'] == machine:
+            previous = run
+    return previous
+
+
+def _report(run, previous, tolerance):
+    print(f'scale {run["scale"]}x ({run["rows"]} rows)')
+    print(f'  {"benchmark":<34} {"time":>9} {"peak":>9} {"vs last":>15}')
+    regressions = []
+    for name, result in run['results'].items():
+        change = ''
+        before = previous['results'].get(name) if previous else None
+        if before:
+            time_ratio = result['seconds'] / before['seconds']
+            peak_ratio = result['peak_bytes'] / max(before['peak_bytes'], 1)
+            change = f'{time_ratio - 1:+.0%} {peak_ratio - 1:+.0%}'
+            if time_ratio > 1 + tolerance or peak_ratio > 1 + tolerance:
+                regressions.append(name)
+                change += ' !'
+        print(
+            f'  {name:<34} {result["seconds"] * 1000:>7.1f}ms '
+            f'{result["peak_bytes"] / 2**20:>7.1f}MB {change:>15}'
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.pages')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.25,
+        help='slowdown or memory growth reported as a regression (default: 0.25)',
+    )
+    parser.add_argument(
+        '--results',
+        type=Path,
+        default=RESULTS,
+        help='file the runs are appended to (default: benchmarks/results.jsonl)',
+    )
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_run_benchmarks(args.repeat)))
+        return
+
+    machine = platform.node()
+    regressions = []
+    for scale in args.scales:
+        results = _run_scale(scale, args.repeat)
+        run = {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'machine': machine,
+            'python': platform.python_version(),
+            'scale': scale,
+            'rows': results.pop('rows'),
+            'results': results,
+        }
+        previous = _previous_run(args.results, scale, machine)
+        regressions += [
+            f'{name} at {scale:g}x' for name in _report(run, previous, args.tolerance)
+        ]
+        with args.results.open('a') as file:
+            file.write(json.dumps(run) + '\n')
+
+    if regressions:
+        sys.exit(f'regressions: {", ".join(regressions)}')
+
+
+if __name__ == '__main__':
+    main()
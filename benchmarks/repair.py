@@ -0,0 +1,73 @@
+import argparse
+import time
+
+from pathlib import Path
+
+import numpy as np
+
+from covid_etl.build import RAW_DIR
+from covid_etl.repair import mask_inflated, mask_inflated_scan
+from covid_etl.sources import _melt_dates, read_jhu_wide
+from covid_etl.transform import group_bounds
+
+
+# Times the notebook's per-country scan (through groupby.apply, as in
+# COVID19_Datasets_Cleaning.ipynb) against the vectorized mask_inflated on the
+# JHU cumulative series, checking that both flag the same rows
+#
+#   python -m benchmarks.repair [--raw-dir DIR] [--repeat N]
+
+FILES = {
+    'confirmed': 'time_series_covid19_confirmed_global.csv',
+    'deaths': 'time_series_covid19_deaths_global.csv',
+    'recovered': 'time_series_covid19_recovered_global.csv',
+}
+
+
+def _best_of(repeat, fn, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _scan_by_country(df):
+    masks = df.groupby('country', sort=False)['value'].apply(
+        lambda group: mask_inflated_scan(group.to_numpy())
+    )
+    return np.concatenate(masks.to_numpy())
+
+
+def _vectorized(df):
+    start, _ = group_bounds(df['country'])
+    return mask_inflated(df['value'].to_numpy(dtype='float64'), start)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.repair')
+    parser.add_argument('--raw-dir', default=RAW_DIR)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f'{"file":<10} {"rows":>8} {"flagged":>8} {"scan":>9} {"vector":>9} {"speedup":>8}'
+    )
+    for name, file_name in FILES.items():
+        df = _melt_dates(read_jhu_wide(Path(args.raw_dir) / file_name), 'value')
+
+        scan_time, expected = _best_of(args.repeat, _scan_by_country, df)
+        vector_time, flagged = _best_of(args.repeat, _vectorized, df)
+        if not np.array_equal(expected, flagged):
+            raise AssertionError(f'{name}: vectorized mask differs from the scan')
+
+        print(
+            f'{name:<10} {len(df):>8} {flagged.sum():>8} '
+            f'{scan_time * 1000:>7.1f}ms {vector_time * 1000:>7.1f}ms '
+            f'{scan_time / vector_time:>7.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+import math
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from covid_data.artifact import write_country_artifact
+from covid_etl.views import COUNTRY_COLUMNS
+
+
+# covid_daily_country-shaped data for the benchmarks. At scale 1 it has as many
+# countries and days as the real dataset; scale multiplies the number of rows,
+# split evenly between more countries and more days (sqrt(scale) each)
+
+COUNTRIES = 208
+DAYS = 1143
+START_DATE = '2020-01-22'
+
+
+def _smooth(values, window=7):
+    kernel = np.ones(window) / window
+    return np.apply_along_axis(np.convolve, 1, values, kernel, 'same')
+
+
+def _daily(cumulative):
+    return np.diff(cumulative, axis=1, prepend=0)
+
+
+# Values rising from 0 to 1 around day mid (per country)
+def _logistic(days, mid, width):
+    return 1 / (1 + np.exp(-(days - mid[:, None]) / width))
+
+
+def synthetic_country(scale=1, seed=0):
+    rng = np.random.default_rng(seed)
+    factor = math.sqrt(scale)
+    n, d = round(COUNTRIES * factor), round(DAYS * factor)
+    days = np.arange(d, dtype='float64')
+
+    population = np.round(rng.lognormal(15, 2, n)).clip(1e4, 1.5e9)
+    hdi = rng.uniform(0.38, 0.96, n).round(3)
+
+    # Cases come in three waves per country
+    new_cases = np.zeros((n, d))
+    for _ in range(3):
+        peak = rng.uniform(0, d, n)
+        width = rng.uniform(0.01, 0.05, n) * d
+        height = rng.uniform(1e-4, 3e-3, n) * population
+        new_cases += height[:, None] * np.exp(
+            -(((days - peak[:, None]) / width[:, None]) ** 2)
+        )
+    new_cases = np.round(new_cases * rng.uniform(0.5, 1.5, (n, d)))
+    cases = np.cumsum(new_cases, axis=1)
+
+    fatality = rng.uniform(0.003, 0.03, n)
+    deaths = np.round(cases * fatality[:, None])
+
+    # Recoveries follow cases two weeks later and stop being reported half way
+    recovered = np.zeros((n, d))
+    recovered[:, 14:] = np.round(cases[:, :-14] * 0.97)
+    stopped = rng.integers(d // 3, d // 2 + 1, n)
+    recovered[days >= stopped[:, None]] = np.nan
+
+    # Vaccinations start after the first 30% of days
+    coverage = rng.uniform(0.2, 0.95, n)
+    started = days >= 0.3 * d
+    people_vaccinated = np.round(
+        population[:, None]
+        * coverage[:, None]
+        * _logistic(days, rng.uniform(0.4, 0.6, n) * d, d / 30)
+    )
+    people_fully_vaccinated = np.round(
+        0.9 * np.roll(people_vaccinated, d // 20, axis=1)
+    )
+    total_boosters = np.round(0.5 * np.roll(people_fully_vaccinated, d // 10, axis=1))
+    for values in (people_vaccinated, people_fully_vaccinated, total_boosters):
+        values[~np.broadcast_to(started, values.shape)] = np.nan
+    total_vaccinations = people_vaccinated + people_fully_vaccinated + total_boosters
+
+    stringency = (
+        np.cumsum(rng.normal(0, 2, (n, d)), axis=1) + rng.uniform(20, 80, n)[:, None]
+    )
+    stringency = np.round(stringency.clip(0, 100), 2)
+
+    active = cases - deaths - recovered
+    active[active < 0] = np.nan
+    per_100k = 100000 / population[:, None]
+    new_cases_smoothed = np.round(_smooth(new_cases))
+    previous = np.roll(new_cases_smoothed, 1, axis=1)
+    previous[:, 0] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth_rate = new_cases_smoothed / previous - 1
+        case_fatality_rate = np.where(cases > 0, deaths / cases * 100000, np.nan)
+
+    columns = {
+        'cases': cases,
+        'new_cases_smoothed': new_cases_smoothed,
+        'new_cases_growth_rate': np.where(
+            np.isfinite(growth_rate), growth_rate, np.nan
+        ),
+        'deaths': deaths,
+        'new_deaths_smoothed': np.round(_smooth(_daily(deaths))),
+        'recovered': recovered,
+        'new_recovered_smoothed': np.round(_smooth(_daily(recovered))),
+        'people_vaccinated': people_vaccinated,
+        'people_fully_vaccinated': people_fully_vaccinated,
+        'total_vaccinations': total_vaccinations,
+        'total_boosters': total_boosters,
+        'daily_people_vaccinated': np.round(_smooth(_daily(people_vaccinated))),
+        'daily_people_fully_vaccinated': np.round(
+            _smooth(_daily(people_fully_vaccinated))
+        ),
+        'daily_vaccinations': np.round(_smooth(_daily(total_vaccinations))),
+        'daily_boosters': np.round(_smooth(_daily(total_boosters))),
+        'population': np.broadcast_to(population[:, None], (n, d)),
+        'stringency_value': stringency,
+        # HDI is published up to the last full year, so the last days have none
+        'hdi_value': np.where(days < 0.9 * d, hdi[:, None], np.nan),
+        'active': active,
+        'infection_rate': cases * per_100k,
+        'people_vaccinated_rate': people_vaccinated * per_100k,
+        'fully_vaccinated_rate': people_fully_vaccinated * per_100k,
+        'case_incidence_rate': new_cases_smoothed * per_100k,
+        'case_fatality_rate': case_fatality_rate,
+        'active_case_rate': active * per_100k,
+    }
+
+    width = len(str(n))
+    df = pd.DataFrame(
+        {
+            'country': np.repeat([f'Country {i:0{width}d}' for i in range(n)], d),
+            'date': np.tile(pd.date_range(START_DATE, periods=d).to_numpy(), n),
+            **{name: values.ravel() for name, values in columns.items()},
+        }
+    )
+    return df[COUNTRY_COLUMNS]
+
+
+# Writes the country artifact the dashboards read to data_dir
+def write_dataset(data_dir, scale=1, seed=0):
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    country = synthetic_country(scale, seed)
+    write_country_artifact(country, data_dir / 'covid_daily_country.parquet')
+    return data_dir
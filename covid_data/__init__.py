@@ -0,0 +1,71 @@
+from covid_data.artifact import compact_country
+from covid_data.coverage import Coverage
+from covid_data.cube import MetricCube
+from covid_data.decimate import POINT_BUDGET, decimate, lttb_indices
+from covid_data.figures import (
+    FigureCache,
+    cached_figure,
+    figure_cache,
+    graph_area_trace,
+    graph_stacked_traces,
+)
+from covid_data.loader import (
+    COUNTRY_ARTIFACT,
+    COUNTRY_MAPPED,
+    COUNTRY_SNAPSHOT,
+    DATA_DIR,
+    DATABASE,
+    MAP_FRAMES,
+    RANK_INDEX,
+    REGION_ARTIFACT,
+    build_country_artifact,
+    build_map_frames,
+    build_rank_index,
+    clear_cache,
+    connect_database,
+    fetch_snapshot,
+    load_country,
+    load_country_coverage,
+    load_country_cube,
+    load_country_ranks,
+    load_country_regions,
+    load_country_store,
+    load_country_trendlines,
+    load_global,
+    load_map_frames,
+    load_rank_index,
+    load_region_index,
+    publish_country_columns,
+    refresh,
+)
+from covid_data.map_frames import MAP_METRICS, MapFrames, write_map_frames
+from covid_data.mapped import publish_columns, read_mapped_columns
+from covid_data.ranks import (
+    RANK_METRICS,
+    RankTable,
+    rank_index,
+    rank_order,
+    write_rank_index,
+)
+from covid_data.regions import (
+    TOTAL_REGION,
+    read_region_index,
+    read_region_rows,
+    write_region_artifact,
+)
+from covid_data.regression import fit_trendlines, predict, trendline
+from covid_data.sql import query_country, query_date, query_global
+from covid_data.store import CountryStore
+from covid_data.totals import GLOBAL_SOURCE_COLUMNS, global_totals
+from covid_data.trace import (
+    Trace,
+    current_trace,
+    finish_trace,
+    instrumented,
+    plotly_chart,
+    show_timings,
+    span,
+    start_trace,
+    timings_requested,
+    traced,
+)
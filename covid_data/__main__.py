@@ -0,0 +1,65 @@
+import argparse
+
+from covid_data.api import make_server
+from covid_data.loader import (
+    COUNTRY_ARTIFACT,
+    COUNTRY_MAPPED,
+    COUNTRY_SNAPSHOT,
+    build_country_artifact,
+    publish_country_columns,
+    refresh,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m covid_data',
+        description='Manage the local data snapshots used by the dashboards.',
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser(
+        'refresh', help='re-download the country snapshot from upstream'
+    )
+    subparsers.add_parser(
+        'build-artifact',
+        help='convert the local country snapshot into the columnar artifact',
+    )
+    subparsers.add_parser(
+        'publish-columns',
+        help='publish the artifact as memory-mapped columns shared by every process',
+    )
+    serve = subparsers.add_parser(
+        'serve', help='serve metric series over a local read-only HTTP API'
+    )
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8600)
+
+    args = parser.parse_args()
+
+    if args.command == 'refresh':
+        refresh()
+        print(f'Refreshed {COUNTRY_SNAPSHOT}')
+        print(f'Rebuilt {COUNTRY_ARTIFACT}')
+
+    if args.command == 'build-artifact':
+        build_country_artifact()
+        print(f'Built {COUNTRY_ARTIFACT}')
+
+    if args.command == 'publish-columns':
+        publish_country_columns()
+        print(f'Published {COUNTRY_MAPPED}')
+
+    if args.command == 'serve':
+        server = make_server(args.host, args.port)
+        host, port = server.server_address[:2]
+        print(f'Serving http://{host}:{port}/', flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == '__main__':
+    main()
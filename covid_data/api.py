@@ -0,0 +1,245 @@
+import hashlib
+import json
+import logging
+import threading
+
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import pyarrow as pa
+
+from covid_data.loader import data_version, load_country_store, load_global
+
+
+# Read-only HTTP API over the in-memory data, for services that want the
+# series the dashboards chart:
+#
+#   GET /countries
+#   GET /country?country=Germany&metric=new_cases_smoothed[&start=&end=&format=]
+#   GET /global?metric=case_fatality_rate[&start=&end=&format=]
+#
+# country and metric can be repeated (or metrics comma-separated); without
+# metric every column is returned. start and end bound the dates, inclusive,
+# and format is json (the default), csv or arrow (an Arrow IPC stream).
+# Responses carry an ETag derived from the query and the data on disk, so a
+# poll with a matching If-None-Match gets a 304 before any data is read, and
+# response bodies are kept in a cache keyed by the same. start and end with a
+# UTC offset are compared as the UTC date and time
+
+RESPONSE_CACHE_BYTES = 64 * 2**20
+
+FORMATS = {
+    'json': 'application/json',
+    'csv': 'text/csv; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+logger = logging.getLogger(__name__)
+
+
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Least recently used response bodies, evicted once their total size passes
+# max_bytes
+class ResponseCache:
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._bodies = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._bodies:
+                self.size -= len(self._bodies.pop(key))
+            self._bodies[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._bodies.popitem(last=False)
+                self.size -= len(evicted)
+
+
+def _values(query, name):
+    values = []
+    for value in query.get(name, []):
+        values.extend(part for part in value.split(',') if part)
+    return values
+
+
+def _single(query, name, default=None):
+    values = query.get(name, [])
+    if len(values) > 1:
+        raise QueryError(HTTPStatus.BAD_REQUEST, f'{name} can only be given once')
+    return values[0] if values else default
+
+
+def _date(query, name):
+    value = _single(query, name)
+    if value is None:
+        return None
+    try:
+        date = pd.Timestamp(value)
+    except ValueError:
+        raise QueryError(
+            HTTPStatus.BAD_REQUEST, f'invalid {name} date: {value}'
+        ) from None
+    # The data's dates are naive
+    if date.tz is not None:
+        date = date.tz_convert('UTC').tz_localize(None)
+    return date
+
+
+def _columns(query, available):
+    metrics = _values(query, 'metric') + _values(query, 'metrics')
+    unknown = [metric for metric in metrics if metric not in available]
+    if unknown:
+        raise QueryError(HTTPStatus.BAD_REQUEST, f'unknown metrics: {unknown}')
+    return metrics or list(available)
+
+
+def _between(df, start, end):
+    dates = df['date']
+    lo = 0 if start is None else dates.searchsorted(start, side='left')
+    hi = len(df) if end is None else dates.searchsorted(end, side='right')
+    return df.iloc[lo:hi]
+
+
+def _country_frame(query):
+    store = load_country_store()
+    countries = _values(query, 'country')
+    if not countries:
+        raise QueryError(HTTPStatus.BAD_REQUEST, 'country is required')
+    missing = [country for country in countries if country not in store]
+    if missing:
+        raise QueryError(HTTPStatus.NOT_FOUND, f'unknown countries: {missing}')
+
+    available = [c for c in store.df.columns if c not in ('country', 'date')]
+    columns = ['country', 'date', *_columns(query, available)]
+    start, end = _date(query, 'start'), _date(query, 'end')
+    frames = [_between(store.get(country), start, end) for country in countries]
+    df = pd.concat([frame[columns] for frame in frames], ignore_index=True)
+    df['country'] = df['country'].astype(str)
+    return df
+
+
+def _global_frame(query):
+    df = load_global()
+    available = [column for column in df.columns if column != 'date']
+    columns = ['date', *_columns(query, available)]
+    return _between(df, _date(query, 'start'), _date(query, 'end'))[columns]
+
+
+def _countries_frame(query):
+    return pd.DataFrame({'country': load_country_store().countries})
+
+
+ROUTES = {
+    '/countries': _countries_frame,
+    '/country': _country_frame,
+    '/global': _global_frame,
+}
+
+
+def _encode(df, fmt):
+    if fmt == 'arrow':
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    if 'date' in df:
+        df = df.assign(date=df['date'].dt.strftime('%Y-%m-%d'))
+    if fmt == 'csv':
+        return df.to_csv(index=False).encode()
+    return df.to_json(orient='records').encode()
+
+
+# (route, query) with the order of parameters and values that mean the same
+# query normalized away
+def _query_key(path, query):
+    return (
+        path,
+        tuple(sorted((name, tuple(values)) for name, values in query.items())),
+    )
+
+
+def _etag(version, key):
+    digest = hashlib.sha1(repr((version, key)).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def _etag_matches(header, etag):
+    if header is None:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    server_version = 'covid-data-api'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path not in ROUTES:
+                raise QueryError(HTTPStatus.NOT_FOUND, f'unknown path: {url.path}')
+            fmt = _single(query, 'format', 'json')
+            if fmt not in FORMATS:
+                raise QueryError(HTTPStatus.BAD_REQUEST, f'unknown format: {fmt}')
+
+            key = _query_key(url.path, query)
+            etag = _etag(data_version(), key)
+            if _etag_matches(self.headers.get('If-None-Match'), etag):
+                self._respond(HTTPStatus.NOT_MODIFIED, etag=etag)
+                return
+
+            cache = self.server.response_cache
+            body = cache.get(etag)
+            if body is None:
+                body = _encode(ROUTES[url.path](query), fmt)
+                cache.put(etag, body)
+            self._respond(HTTPStatus.OK, FORMATS[fmt], body, etag)
+        except QueryError as error:
+            body = json.dumps({'error': str(error)}).encode()
+            self._respond(error.status, FORMATS['json'], body)
+        except Exception:
+            logger.exception('error serving %s', self.path)
+            body = json.dumps({'error': 'internal server error'}).encode()
+            self._respond(HTTPStatus.INTERNAL_SERVER_ERROR, FORMATS['json'], body)
+
+    def _respond(self, status, content_type=None, body=b'', etag=None):
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# A server for the API on host:port (port 0 picks a free one, read back from
+# server.server_address), started with serve_forever()
+def make_server(host='127.0.0.1', port=8600, cache_bytes=RESPONSE_CACHE_BYTES):
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.response_cache = ResponseCache(cache_bytes)
+    return server
@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# Columns that are rates or indices, stored as float32 regardless of precision
+FLOAT32_COLUMNS = [
+    'new_cases_growth_rate',
+    'stringency_value',
+    'hdi_value',
+    'infection_rate',
+    'people_vaccinated_rate',
+    'fully_vaccinated_rate',
+    'case_incidence_rate',
+    'case_fatality_rate',
+    'active_case_rate',
+]
+
+
+# Shrinks a count column to the smallest dtype that holds every value exactly:
+# an integer type when there are no gaps, otherwise float32 if it round-trips
+def downcast_count(series):
+    values = series.to_numpy(dtype='float64')
+    if not np.isnan(values).any() and np.array_equal(values, np.round(values)):
+        return pd.to_numeric(series, downcast='integer')
+
+    as_float32 = series.astype('float32')
+    if np.array_equal(as_float32.to_numpy(dtype='float64'), values, equal_nan=True):
+        return as_float32
+    return series
+
+
+# Converts a covid_daily_country frame to its compact in-memory representation
+def compact_country(df):
+    df = df.copy()
+    df['country'] = df['country'].astype('category')
+    df['date'] = pd.to_datetime(df['date'])
+
+    for column in df.columns.drop(['country', 'date']):
+        if column in FLOAT32_COLUMNS:
+            df[column] = df[column].astype('float32')
+        else:
+            df[column] = downcast_count(df[column])
+
+    df = df.sort_values(['country', 'date']).reset_index(drop=True)
+    return df
+
+
+# Writes the compact frame as Parquet, replacing any previous artifact atomically
+def write_country_artifact(df, path):
+    tmp_path = f'{path}.tmp'
+    compact_country(df).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+# Reads only the requested columns from the artifact, always keeping the keys
+def read_country_artifact(path, columns=None):
+    if columns is not None:
+        columns = ['country', 'date'] + [
+            column for column in columns if column not in ('country', 'date')
+        ]
+    return pd.read_parquet(path, columns=columns)
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+
+# First and last date with a value, and the number of values, of each metric
+# for every country and over all countries, computed once from a CountryStore.
+# Date sliders read their bounds from it instead of scanning the data
+class Coverage:
+    def __init__(self, store, metrics):
+        df = store.df
+        dates = df['date'].to_numpy()
+        starts, stops = np.array(list(store.ranges.values())).reshape(-1, 2).T
+
+        # Rows are sorted by (country, date), so a country's first and last
+        # values are the first and last non-null rows in its range
+        tables = []
+        for metric in metrics:
+            rows = np.flatnonzero(df[metric].notna().to_numpy())
+            begin = np.searchsorted(rows, starts)
+            end = np.searchsorted(rows, stops)
+            count = end - begin
+            present = count > 0
+            first = np.full(len(starts), np.datetime64('NaT'), dtype=dates.dtype)
+            last = first.copy()
+            first[present] = dates[rows[begin[present]]]
+            last[present] = dates[rows[end[present] - 1]]
+            tables.append(
+                pd.DataFrame(
+                    {
+                        'country': store.countries,
+                        'metric': metric,
+                        'first': first,
+                        'last': last,
+                        'count': count,
+                    }
+                )
+            )
+        self.by_country = pd.concat(tables, ignore_index=True)
+        self.overall = self.by_country.groupby('metric', sort=False).agg(
+            first=('first', 'min'), last=('last', 'max'), count=('count', 'sum')
+        )
+
+        self.entries = {
+            (country, metric): (first, last, count)
+            for country, metric, first, last, count in self.by_country.itertuples(
+                index=False
+            )
+        }
+        for metric, first, last, count in self.overall.itertuples():
+            self.entries[None, metric] = (first, last, count)
+
+    # (first, last) date with a value of metric in country, or over all
+    # countries if country is None. Both are NaT if there are no values
+    def date_range(self, metric, country=None):
+        first, last, _ = self.entries[country, metric]
+        return first, last
+
+    def count(self, metric, country=None):
+        return self.entries[country, metric][2]
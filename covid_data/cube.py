@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from covid_data.ranks import rank_order
+
+
+# Dense (date, country) arrays of each metric built from a CountryStore, for
+# views that compare every country on a single date. Looking up a date is a
+# dict hit and its cross-section is one row of each metric's array. Metrics
+# whose values are all exact in float32 (the rates, which the artifact already
+# stores as float32) are held as float32, the others as float64
+class MetricCube:
+    def __init__(self, store, metrics):
+        df = store.df
+        self.metrics = list(metrics)
+        self.countries = np.asarray(store.countries, dtype=object)
+        self.dates = pd.DatetimeIndex(np.unique(df['date']))
+        self.offsets = {date: offset for offset, date in enumerate(self.dates)}
+
+        # Rows are sorted by country, so each country's rows share a position
+        lengths = [stop - start for start, stop in store.ranges.values()]
+        country_pos = np.repeat(np.arange(len(self.countries)), lengths)
+        date_pos = self.dates.searchsorted(df['date'])
+
+        shape = (len(self.dates), len(self.countries))
+        self.present = np.zeros(shape, dtype=bool)
+        self.present[date_pos, country_pos] = True
+        self.columns = {}
+        for metric in self.metrics:
+            values = df[metric].to_numpy(dtype='float64')
+            dtype = 'float64'
+            if np.array_equal(values.astype('float32'), values, equal_nan=True):
+                dtype = 'float32'
+            self.columns[metric] = np.full(shape, np.nan, dtype=dtype)
+            self.columns[metric][date_pos, country_pos] = values
+
+    # Row offset of date in the cube, or None if no country reported that day
+    def offset(self, date):
+        return self.offsets.get(pd.Timestamp(date))
+
+    # Countries reported on the date at offset, optionally above a population
+    def _country_mask(self, offset, min_population=None):
+        if offset is None:
+            return np.zeros(len(self.countries), dtype=bool)
+        mask = self.present[offset]
+        if min_population is not None:
+            population = self.columns['population'][offset]
+            mask = mask & (population > min_population)
+        return mask
+
+    def _frame(self, offset, positions, metrics):
+        if offset is None:
+            return pd.DataFrame(columns=['country', *metrics])
+        df = pd.DataFrame(
+            {
+                metric: self.columns[metric][offset, positions].astype('float64')
+                for metric in metrics
+            }
+        )
+        df.insert(0, 'country', self.countries[positions])
+        return df
+
+    # country plus the given metrics for every country reported on date
+    def cross_section(self, date, metrics, min_population=None):
+        offset = self.offset(date)
+        positions = np.flatnonzero(self._country_mask(offset, min_population))
+        return self._frame(offset, positions, metrics)
+
+    # The n countries with the largest (or smallest) value of measure on date,
+    # ordered so that the highest-ranked country comes last. They are ranked
+    # as RankTable ranks them, ties in country order
+    def top_n(self, measure, date, n, largest=True, metrics=(), min_population=None):
+        offset = self.offset(date)
+        positions = np.zeros(0, dtype='int64')
+        if offset is not None:
+            eligible = self._country_mask(offset, min_population)
+            values = self.columns[measure][offset]
+            order, _, count = rank_order(values, eligible, largest)
+            positions = order[: min(n, count)][::-1]
+
+        return self._frame(offset, positions, [measure, *metrics])
@@ -0,0 +1,54 @@
+import numpy as np
+
+# Downsampling of long daily series for the charts' fast (WebGL) mode. Points
+# are picked with Largest-Triangle-Three-Buckets, which keeps the peaks and
+# troughs that picking every nth day would skip, and always keeps the first
+# and last day
+
+# Points kept per series
+POINT_BUDGET = 400
+
+
+# Positions of the n_out points LTTB keeps out of (x, y). The points between
+# the first and last are split into n_out - 2 buckets, and from each the point
+# forming the largest triangle with the point kept before it and the mean of
+# the next bucket is kept
+def lttb_indices(x, y, n_out=POINT_BUDGET):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+
+    # Bucket i covers edges[i]:edges[i + 1], and the last point follows the
+    # last bucket
+    edges = np.arange(n_out - 1) * (n - 2) // (n_out - 2) + 1
+    edges = np.append(edges, n)
+
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x, edges[:-1]) / sizes
+    mean_y = np.add.reduceat(y, edges[:-1]) / sizes
+    edges = edges.tolist()
+
+    kept = np.empty(n_out, dtype='int64')
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - mean_x[i + 1]) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (mean_y[i + 1] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+# The rows of df that LTTB keeps for column y over column x (a date or numeric
+# column). Series stacked on each other are decimated on their total, so that
+# they stay on the same dates
+def decimate(df, x, y, n_out=POINT_BUDGET):
+    x = df[x].to_numpy()
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').astype('int64')
+    return df.iloc[lttb_indices(x, df[y].to_numpy(dtype='float64'), n_out)]
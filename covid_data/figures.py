@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+
+from collections import OrderedDict
+from functools import wraps
+
+import plotly.graph_objs as go
+import plotly.io as pio
+
+from covid_data.decimate import decimate
+from covid_data.trace import instrumented, span
+
+
+# Serialized plotly figures kept in process memory and shared by every session,
+# so that a chart whose inputs have not changed since any session last drew it
+# is not rebuilt. Cached specs are turned back into figures without plotly's
+# validation, which already ran when they were built
+
+FIGURE_CACHE_BYTES = int(os.environ.get('COVID_FIGURE_CACHE_MB', 64)) * 2**20
+
+
+# Least recently used figure specs, evicted once their total size passes
+# max_bytes
+class FigureCache:
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._specs = OrderedDict()
+        self._lock = threading.Lock()
+
+    # The figure cached under key, built with build() and cached if missing
+    def get(self, key, build):
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._specs.move_to_end(key)
+
+        if spec is None:
+            with span('build figure'):
+                fig = build()
+            with span('serialize figure'):
+                spec = pio.to_json(fig, validate=False)
+            self._put(key, spec)
+        with span('load cached figure'):
+            return go.Figure(json.loads(spec), _validate=False)
+
+    def _put(self, key, spec):
+        if len(spec) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._specs:
+                self.size -= len(self._specs.pop(key))
+            self._specs[key] = spec
+            self.size += len(spec)
+            while self.size > self.max_bytes:
+                _, evicted = self._specs.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._specs),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._specs.clear()
+            self.size = 0
+
+
+figure_cache = FigureCache()
+
+
+# Caches the figures returned by a graph_* function, keyed by the function
+# (and the page it is defined in) and its arguments. The arguments have to be
+# hashable and, with the data loaded by covid_data, all the figure depends on
+def cached_figure(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (
+            func.__code__.co_filename,
+            func.__qualname__,
+            args,
+            tuple(sorted(kwargs.items())),
+        )
+        return figure_cache.get(key, lambda: func(*args, **kwargs))
+
+    return wrapper
+
+
+# WebGL area trace for the fast chart mode, as px.area draws it
+@instrumented
+def graph_area_trace(df, measure, color):
+    return go.Scattergl(
+        x=df['date'],
+        y=df[measure],
+        fill='tozeroy',
+        mode='lines',
+        line=dict(color=color),
+        hovertemplate=f'date=%{{x}}<br>{measure}=%{{y}}<extra></extra>',
+    )
+
+
+# Stacked WebGL area traces for the fast chart mode, decimated on their total
+@instrumented
+def graph_stacked_traces(df, measures, colors):
+    df = decimate(df.assign(total=df[measures].sum(axis=1)), 'date', 'total')
+    traces = []
+    stacked = 0
+    for measure, color in zip(measures, colors):
+        stacked = stacked + df[measure]
+        traces.append(
+            go.Scattergl(
+                x=df['date'],
+                y=stacked,
+                customdata=df[measure],
+                fill='tonexty' if traces else 'tozeroy',
+                mode='lines',
+                name=measure,
+                line=dict(color=color),
+                hovertemplate=(
+                    f'Measure={measure}<br>date=%{{x}}<br>val=%{{customdata}}'
+                    '<extra></extra>'
+                ),
+            )
+        )
+    return traces
@@ -0,0 +1,369 @@
+import os
+import sqlite3
+import tempfile
+import urllib.request
+
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+from covid_data.artifact import read_country_artifact, write_country_artifact
+from covid_data.coverage import Coverage
+from covid_data.cube import MetricCube
+from covid_data.figures import figure_cache
+from covid_data.map_frames import MAP_METRICS, MapFrames, write_map_frames
+from covid_data.mapped import (
+    COLUMNS_DIR_NAME,
+    MANIFEST,
+    publish_columns,
+    read_mapped_columns,
+)
+from covid_data.ranks import RANK_METRICS, RankTable, write_rank_index
+from covid_data.regions import read_region_index, read_region_rows
+from covid_data.regression import fit_trendlines
+from covid_data.store import CountryStore
+from covid_data.totals import GLOBAL_SOURCE_COLUMNS, global_totals
+from covid_data.trace import instrumented
+
+
+# Locations of the local on-disk snapshots and their upstream sources. The
+# global totals are summed from the country data (covid_data.totals)
+ROOT_DIR = Path(__file__).resolve().parent.parent
+DATA_DIR = Path(os.environ.get('COVID_DATA_DIR', ROOT_DIR / 'visualization_data'))
+
+COUNTRY_SNAPSHOT = DATA_DIR / 'covid_daily_country.zip'
+COUNTRY_ARTIFACT = DATA_DIR / 'covid_daily_country.parquet'
+COUNTRY_MAPPED = DATA_DIR / COLUMNS_DIR_NAME
+REGION_ARTIFACT = DATA_DIR / 'covid_daily_region.parquet'
+MAP_FRAMES = DATA_DIR / 'covid_daily_map.npz'
+RANK_INDEX = DATA_DIR / 'covid_daily_rank.parquet'
+DATABASE = DATA_DIR / 'covid_daily.sqlite'
+
+COUNTRY_URL = 'https://github.com/jamesinjune/COVID_19_Data_Exploration/raw/refs/heads/main/visualization_data/covid_daily_country.zip'
+
+
+# Downloads url into path, swapping the file in atomically so that readers
+# never see a partially written snapshot
+def fetch_snapshot(url, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp, urllib.request.urlopen(url) as response:
+            while chunk := response.read(1 << 20):
+                tmp.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def _ensure_snapshot(url, path):
+    if not Path(path).exists():
+        fetch_snapshot(url, path)
+    return path
+
+
+def _read_country_snapshot():
+    path = _ensure_snapshot(COUNTRY_URL, COUNTRY_SNAPSHOT)
+    return pd.read_csv(path, compression='zip', encoding='latin-1')
+
+
+# Converts the zipped CSV snapshot into the compact columnar artifact
+# (and republishes the memory-mapped columns, map frames and rank index if
+# they are in use)
+def build_country_artifact():
+    path = write_country_artifact(_read_country_snapshot(), COUNTRY_ARTIFACT)
+    if (COUNTRY_MAPPED / MANIFEST).exists():
+        publish_country_columns()
+    if MAP_FRAMES.exists():
+        build_map_frames()
+    if RANK_INDEX.exists():
+        build_rank_index()
+    return path
+
+
+# Publishes the artifact as memory-mapped columns (covid_data.mapped), which
+# the loaders read from then on instead of the artifact, so that dashboard
+# processes on one host share a single copy of the data
+def publish_country_columns():
+    if not COUNTRY_ARTIFACT.exists():
+        write_country_artifact(_read_country_snapshot(), COUNTRY_ARTIFACT)
+    return publish_columns(read_country_artifact(COUNTRY_ARTIFACT), COUNTRY_MAPPED)
+
+
+# Writes the world map's per-date frames (covid_data.map_frames) from the
+# artifact. covid_etl writes them with every build
+def build_map_frames():
+    if not COUNTRY_ARTIFACT.exists():
+        write_country_artifact(_read_country_snapshot(), COUNTRY_ARTIFACT)
+    df = read_country_artifact(COUNTRY_ARTIFACT, MAP_METRICS)
+    return write_map_frames(CountryStore(df), MAP_FRAMES)
+
+
+# Writes the rank index (covid_data.ranks.rank_index) from the artifact.
+# covid_etl writes it with every build
+def build_rank_index():
+    if not COUNTRY_ARTIFACT.exists():
+        write_country_artifact(_read_country_snapshot(), COUNTRY_ARTIFACT)
+    df = read_country_artifact(COUNTRY_ARTIFACT, RANK_METRICS)
+    return write_rank_index(df, RANK_INDEX)
+
+
+# Modification times of the artifacts, columns manifest, map frames, rank
+# index and database, so that a rebuild on disk is picked up by running
+# dashboards
+def _snapshot_versions():
+    versions = []
+    for path in (
+        COUNTRY_ARTIFACT,
+        COUNTRY_MAPPED / MANIFEST,
+        REGION_ARTIFACT,
+        MAP_FRAMES,
+        RANK_INDEX,
+        DATABASE,
+    ):
+        try:
+            versions.append(path.stat().st_mtime_ns)
+        except FileNotFoundError:
+            versions.append(None)
+    return tuple(versions)
+
+
+# Changes whenever the files the loaders read are rebuilt
+def data_version():
+    return _snapshot_versions()
+
+
+_loaded_versions = None
+
+
+# Calls a cached loader, first dropping every cached copy if the files on disk
+# have changed since they were read
+def _cached(load, *args):
+    global _loaded_versions
+    if _snapshot_versions() != _loaded_versions:
+        clear_cache()
+    value = load(*args)
+    _loaded_versions = _snapshot_versions()
+    return value
+
+
+@lru_cache(maxsize=None)
+def _load_country(columns):
+    if (COUNTRY_MAPPED / MANIFEST).exists():
+        return read_mapped_columns(COUNTRY_MAPPED, columns)
+    if not COUNTRY_ARTIFACT.exists():
+        build_country_artifact()
+    return read_country_artifact(COUNTRY_ARTIFACT, columns)
+
+
+# Country-level data, read once per process from the local artifact, or mapped
+# from the published columns. Passing columns only materializes those columns
+# (plus country and date)
+@instrumented
+def load_country(columns=None):
+    if columns is not None:
+        columns = tuple(columns)
+    return _cached(_load_country, columns)
+
+
+@lru_cache(maxsize=None)
+def _load_country_store(columns):
+    return CountryStore(_load_country(columns))
+
+
+# Country-level data partitioned by country, built once per process
+@instrumented
+def load_country_store(columns=None):
+    if columns is not None:
+        columns = tuple(columns)
+    return _cached(_load_country_store, columns)
+
+
+@lru_cache(maxsize=None)
+def _load_country_cube(columns, metrics):
+    return MetricCube(_load_country_store(columns), metrics)
+
+
+# Dense (date, country, metric) cube over the given metrics, built once per
+# process
+@instrumented
+def load_country_cube(metrics, columns=None):
+    if columns is not None:
+        columns = tuple(columns)
+    return _cached(_load_country_cube, columns, tuple(metrics))
+
+
+@lru_cache(maxsize=None)
+def _load_country_coverage(columns, metrics):
+    return Coverage(_load_country_store(columns), metrics)
+
+
+# First and last dates with values and value counts of the given metrics, per
+# country and overall, computed once per process
+@instrumented
+def load_country_coverage(metrics, columns=None):
+    if columns is not None:
+        columns = tuple(columns)
+    return _cached(_load_country_coverage, columns, tuple(metrics))
+
+
+@lru_cache(maxsize=None)
+def _load_country_trendlines(columns, metrics, pairs, min_population, offset):
+    cube = _load_country_cube(columns, metrics)
+    return fit_trendlines(cube, pairs, min_population, offset)
+
+
+# OLS trendlines for every date of the cube and every (measure_x, measure_y,
+# log_x, log_y) pair, fitted once per process
+@instrumented
+def load_country_trendlines(
+    pairs, metrics, columns=None, min_population=None, offset=0
+):
+    if columns is not None:
+        columns = tuple(columns)
+    pairs = tuple(tuple(pair) for pair in pairs)
+    return _cached(
+        _load_country_trendlines, columns, tuple(metrics), pairs, min_population, offset
+    )
+
+
+@lru_cache(maxsize=None)
+def _load_country_ranks(columns, metrics, measures, n, min_population):
+    cube = _load_country_cube(columns, metrics)
+    return RankTable(cube, measures, n, min_population)
+
+
+# The n highest and lowest ranked countries of every date of the cube for each
+# measure, ranked once per process
+@instrumented
+def load_country_ranks(measures, metrics, columns=None, n=15, min_population=None):
+    if columns is not None:
+        columns = tuple(columns)
+    return _cached(
+        _load_country_ranks, columns, tuple(metrics), tuple(measures), n, min_population
+    )
+
+
+@lru_cache(maxsize=None)
+def _load_rank_index():
+    if not RANK_INDEX.exists():
+        build_rank_index()
+    return CountryStore(pd.read_parquet(RANK_INDEX))
+
+
+# Every country's global rank and percentile in each of RANK_METRICS on every
+# date, partitioned by country, read once per process
+@instrumented
+def load_rank_index():
+    return _cached(_load_rank_index)
+
+
+@lru_cache(maxsize=None)
+def _load_global(columns):
+    return global_totals(_load_country_store(columns))
+
+
+# Global totals by date, summed once per process from the country store over
+# columns (plus the columns they are summed from). A page passing the columns
+# of the store it loads shares that store
+@instrumented
+def load_global(columns=()):
+    columns = tuple(dict.fromkeys([*columns, *GLOBAL_SOURCE_COLUMNS]))
+    return _cached(_load_global, columns)
+
+
+@lru_cache(maxsize=None)
+def _load_region_index():
+    if not REGION_ARTIFACT.exists():
+        return {}
+    return read_region_index(REGION_ARTIFACT)
+
+
+# Country -> its Province/State regions, the rollup (TOTAL_REGION) first, for
+# the countries reported by region. Empty until covid_etl has built the
+# region artifact
+@instrumented
+def load_region_index():
+    return _cached(_load_region_index)
+
+
+# Bounded, as there is one entry per country viewed
+@lru_cache(maxsize=32)
+def _load_country_regions(country):
+    return CountryStore(read_region_rows(REGION_ARTIFACT, country), key='region')
+
+
+# The regions of one country and its precomputed rollup, partitioned by region
+# (CountryStore.get and series take a region). Only that country's rows are
+# read
+@instrumented
+def load_country_regions(country):
+    return _cached(_load_country_regions, country)
+
+
+@lru_cache(maxsize=None)
+def _load_map_frames():
+    if not MAP_FRAMES.exists():
+        build_map_frames()
+    return MapFrames(MAP_FRAMES)
+
+
+# The world map's key frames and, on demand, daily frames, opened once per
+# process
+@instrumented
+def load_map_frames():
+    return _cached(_load_map_frames)
+
+
+@lru_cache(maxsize=None)
+def _connect_database():
+    if not DATABASE.exists():
+        raise FileNotFoundError(
+            f'{DATABASE} not found, run python -m covid_etl database to create it'
+        )
+    return sqlite3.connect(
+        f'{DATABASE.as_uri()}?mode=ro', uri=True, check_same_thread=False
+    )
+
+
+# Read-only connection to the local SQLite database built by covid_etl,
+# shared by every session
+@instrumented
+def connect_database():
+    return _cached(_connect_database)
+
+
+# Closes the cached database connection, if one is open
+def _close_database():
+    if _connect_database.cache_info().currsize:
+        _connect_database().close()
+    _connect_database.cache_clear()
+
+
+# Drops the in-process copies so that the next load re-reads the files
+def clear_cache():
+    _load_country.cache_clear()
+    _load_country_store.cache_clear()
+    _load_country_cube.cache_clear()
+    _load_country_coverage.cache_clear()
+    _load_country_trendlines.cache_clear()
+    _load_country_ranks.cache_clear()
+    _load_rank_index.cache_clear()
+    _load_global.cache_clear()
+    _load_region_index.cache_clear()
+    _load_country_regions.cache_clear()
+    _load_map_frames.cache_clear()
+    _close_database()
+    figure_cache.clear()
+
+
+# Re-downloads the country snapshot from upstream, rebuilds the artifact and
+# drops the in-process copies
+def refresh():
+    fetch_snapshot(COUNTRY_URL, COUNTRY_SNAPSHOT)
+    build_country_artifact()
+    clear_cache()
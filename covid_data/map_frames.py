@@ -0,0 +1,106 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from covid_data.cube import MetricCube
+
+
+# Per-date values of the world map's metrics for every country, computed once
+# when the data is built and stored as compressed arrays. The map animates
+# over weekly key frames, stored on their own so that opening the map only
+# decompresses those; the full daily frames are read the first time a single
+# day is shown
+
+MAP_METRICS = [
+    'infection_rate',
+    'case_fatality_rate',
+    'people_vaccinated_rate',
+    'stringency_value',
+]
+
+# Days between key frames
+KEY_FRAME_DAYS = 7
+
+# Percentile of each metric's values taken as the top of its colour scale, so
+# that a few outliers do not wash out every other country
+COLOR_PERCENTILE = 99
+
+
+# Offsets of the key frames among n daily frames: every KEY_FRAME_DAYS-th day
+# and the last one
+def key_offsets(n):
+    offsets = np.arange(0, n, KEY_FRAME_DAYS)
+    if n and offsets[-1] != n - 1:
+        offsets = np.append(offsets, n - 1)
+    return offsets
+
+
+# Writes the frames of a CountryStore holding the MAP_METRICS columns,
+# replacing any previous file atomically. Countries without an ISO 3166 code
+# cannot be placed on the map and are left out
+def write_map_frames(store, path):
+    import country_converter as coco
+
+    cube = MetricCube(store, MAP_METRICS)
+    codes = coco.convert(names=list(cube.countries), to='ISO3', not_found=None)
+    if isinstance(codes, str):
+        codes = [codes]
+    keep = np.array([code is not None for code in codes], dtype=bool)
+
+    arrays = {
+        'dates': cube.dates.to_numpy(dtype='datetime64[D]'),
+        'countries': cube.countries[keep].astype(str),
+        'iso3': np.array(codes, dtype=object)[keep].astype(str),
+    }
+    keys = key_offsets(len(cube.dates))
+    for metric in MAP_METRICS:
+        values = cube.columns[metric][:, keep].astype('float32')
+        arrays[f'{metric}_daily'] = values
+        arrays[f'{metric}_keys'] = values[keys]
+        valid = values[~np.isnan(values)]
+        color_range = [0, 1]
+        if len(valid):
+            color_range = [valid.min(), np.percentile(valid, COLOR_PERCENTILE)]
+        arrays[f'{metric}_range'] = np.array(color_range, dtype='float32')
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.savez_compressed(file, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+# The frames in a file written by write_map_frames. Key frames are read up
+# front; each metric's daily frames are decompressed on first use
+class MapFrames:
+    def __init__(self, path):
+        self._file = np.load(path, allow_pickle=False)
+        self._lock = threading.Lock()
+        self._daily = {}
+
+        self.dates = pd.DatetimeIndex(self._file['dates'])
+        self.countries = self._file['countries']
+        self.iso3 = self._file['iso3']
+        self.key_dates = self.dates[key_offsets(len(self.dates))]
+        self.keys = {metric: self._file[f'{metric}_keys'] for metric in MAP_METRICS}
+        self.ranges = {
+            metric: tuple(self._file[f'{metric}_range'].tolist())
+            for metric in MAP_METRICS
+        }
+
+    # (key date, country) values of metric
+    def key_frames(self, metric):
+        return self.keys[metric]
+
+    # Every country's value of metric on date, or NaNs on a date outside the
+    # frames
+    def frame(self, metric, date):
+        offset = self.dates.get_indexer([pd.Timestamp(date)])[0]
+        if offset < 0:
+            return np.full(len(self.countries), np.nan, dtype='float32')
+        with self._lock:
+            if metric not in self._daily:
+                self._daily[metric] = self._file[f'{metric}_daily']
+        return self._daily[metric][offset]
@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# The compact country frame published as one read-only .npy file per column,
+# which every dashboard process maps rather than reads: the OS keeps a single
+# copy of each column's pages in its page cache, shared by all the processes
+# mapping it. A manifest names the generation directory holding the current
+# columns. Publishing writes a new generation and then replaces the manifest
+# atomically, so readers see either the old or the new build whole; the
+# previous generation is kept for processes still opening its files
+
+# Directory name of the published columns, next to the artifact
+COLUMNS_DIR_NAME = 'covid_daily_country_columns'
+MANIFEST = 'manifest.json'
+
+# Generations kept on disk, the current one included
+KEEP_GENERATIONS = 2
+
+
+def read_manifest(root):
+    try:
+        return json.loads((Path(root) / MANIFEST).read_text())
+    except FileNotFoundError:
+        return None
+
+
+# Writes the columns of a compact frame (categorical, datetime and numeric
+# columns only) as a new generation under root and switches the manifest to it
+def publish_columns(df, root):
+    root = Path(root)
+    manifest = read_manifest(root)
+    generation = manifest['generation'] + 1 if manifest else 1
+    directory = f'columns-{generation}'
+    (root / directory).mkdir(parents=True, exist_ok=True)
+
+    columns = {}
+    for name, series in df.items():
+        entry = {'file': f'{directory}/{name}.npy'}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            values = series.cat.codes.to_numpy()
+            entry['categories'] = series.cat.categories.tolist()
+        else:
+            values = series.to_numpy()
+        np.save(root / entry['file'], values, allow_pickle=False)
+        columns[name] = entry
+
+    new_manifest = {'generation': generation, 'rows': len(df), 'columns': columns}
+    tmp_path = root / f'{MANIFEST}.tmp'
+    tmp_path.write_text(json.dumps(new_manifest, indent=2))
+    os.replace(tmp_path, root / MANIFEST)
+
+    # Files already mapped stay readable after they are removed
+    kept = {
+        f'columns-{g}' for g in range(generation - KEEP_GENERATIONS + 1, generation + 1)
+    }
+    for path in root.glob('columns-*'):
+        if path.name not in kept:
+            shutil.rmtree(path, ignore_errors=True)
+    return root / MANIFEST
+
+
+# The published frame, or only the requested columns (plus the keys), over
+# read-only memory maps of the column files
+def read_mapped_columns(root, columns=None):
+    root = Path(root)
+    manifest = read_manifest(root)
+    if manifest is None:
+        raise FileNotFoundError(f'{root / MANIFEST} not found')
+    if columns is None:
+        columns = list(manifest['columns'])
+    else:
+        columns = ['country', 'date'] + [
+            column for column in columns if column not in ('country', 'date')
+        ]
+
+    data = {}
+    for name in columns:
+        entry = manifest['columns'][name]
+        values = np.load(root / entry['file'], mmap_mode='r', allow_pickle=False)
+        if 'categories' in entry:
+            values = pd.Categorical.from_codes(
+                values, entry['categories'], validate=False
+            )
+        data[name] = values
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,138 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from covid_data.artifact import downcast_count
+
+
+# Ranks values along their last (country) axis: the positions that sort them
+# from rank 1, the highest value (or the lowest if not largest), with ties in
+# country order and the NaNs and positions outside eligible last, the rank
+# at each place of that order, with ties sharing the best rank, and the
+# number of values ranked. The rank index, RankTable and MetricCube.top_n all
+# rank through this, so the country page's rank chart, bar chart and bar
+# chart race agree on ties and missing values
+def rank_order(values, eligible=True, largest=True):
+    valid = eligible & ~np.isnan(values)
+    key = np.where(valid, -values if largest else values, np.inf)
+    order = np.argsort(key, axis=-1, kind='stable')
+    key = np.take_along_axis(key, order, axis=-1)
+
+    places = np.broadcast_to(np.arange(key.shape[-1]) + 1, key.shape)
+    starts = np.ones(key.shape, dtype=bool)
+    starts[..., 1:] = key[..., 1:] != key[..., :-1]
+    ranks = np.maximum.accumulate(np.where(starts, places, 0), axis=-1)
+    return order, ranks, valid.sum(axis=-1)
+
+
+# The leading countries of every date for a set of metrics, ranked in one
+# pass over a MetricCube: each metric's (date, country) values are sorted
+# along the country axis at once, after dropping the countries under
+# min_population, instead of filtering and sorting a cross-section per date
+class RankTable:
+    def __init__(self, cube, measures, n, min_population=None):
+        self.cube = cube
+        self.dates = cube.dates
+        self.countries = cube.countries
+        self.measures = list(measures)
+        self.n = n
+
+        eligible = cube.present
+        if min_population is not None:
+            population = cube.columns['population']
+            eligible = eligible & (population > min_population)
+
+        # (date, position, measure) country positions of the n highest and n
+        # lowest values, highest or lowest first, and -1 past the countries
+        # with a value
+        shape = (len(self.dates), n, len(self.measures))
+        self.top = np.full(shape, -1, dtype='int32')
+        self.bottom = np.full(shape, -1, dtype='int32')
+
+        width = min(n, len(self.countries))
+        for i, measure in enumerate(self.measures):
+            values = cube.columns[measure]
+            for leaders, largest in [(self.top, True), (self.bottom, False)]:
+                order, _, count = rank_order(values, eligible, largest)
+                ranked = np.arange(width) < count[:, None]
+                leaders[:, :width, i] = np.where(ranked, order[:, :width], -1)
+
+    # Long (date, rank, country, value) rows of the leading countries on each
+    # of the given dates (every date by default), rank 1 being the highest
+    # value, or the lowest if not largest
+    def leaders(self, measure, largest=True, dates=None):
+        i = self.measures.index(measure)
+        offsets = np.arange(len(self.dates))
+        if dates is not None:
+            offsets = self.dates.get_indexer(pd.DatetimeIndex(dates))
+            offsets = offsets[offsets >= 0]
+
+        positions = (self.top if largest else self.bottom)[offsets, :, i]
+        date_pos, rank_pos = np.nonzero(positions >= 0)
+        countries = positions[date_pos, rank_pos]
+        return pd.DataFrame(
+            {
+                'date': self.dates[offsets[date_pos]],
+                'rank': rank_pos + 1,
+                'country': self.countries[countries],
+                'value': self.cube.columns[measure][
+                    offsets[date_pos], countries
+                ].astype('float64'),
+            }
+        )
+
+
+# Metrics in the rank index
+RANK_METRICS = [
+    'infection_rate',
+    'case_incidence_rate',
+    'case_fatality_rate',
+    'active_case_rate',
+    'people_vaccinated_rate',
+    'fully_vaccinated_rate',
+]
+
+
+# Every country's global rank in each metric on every date, among the
+# countries with a value that day: <metric>_rank is 1 for the highest value
+# (ties share the best rank) and <metric>_percentile the percentage of ranked
+# countries with a lower value, counting the country itself, so that the top
+# country is at 100. Each metric is ranked over a dense (date, country) array
+# in one pass, and rows keep the (country, date) order of df, so a country's
+# whole history is a single slice. Values are ranked at the float32 precision
+# the artifact stores rates in, so that ties are the same whichever is ranked
+def rank_index(df):
+    countries = df['country'].astype('category')
+    dates, date_pos = np.unique(df['date'].to_numpy(), return_inverse=True)
+    country_pos = countries.cat.codes.to_numpy()
+    shape = (len(dates), len(countries.cat.categories))
+
+    ranks = pd.DataFrame({'country': countries, 'date': df['date']})
+    for metric in RANK_METRICS:
+        values = np.full(shape, np.nan, dtype='float32')
+        values[date_pos, country_pos] = df[metric].to_numpy(dtype='float32')
+        missing = np.isnan(values[date_pos, country_pos])
+
+        for largest in [True, False]:
+            order, ordered, count = rank_order(values, largest=largest)
+            rank = np.empty(shape)
+            np.put_along_axis(rank, order, ordered, axis=-1)
+            rank = np.where(missing, np.nan, rank[date_pos, country_pos])
+            if largest:
+                ranks[f'{metric}_rank'] = downcast_count(
+                    pd.Series(rank, index=ranks.index)
+                )
+            else:
+                percentile = rank / count[date_pos] * 100
+                ranks[f'{metric}_percentile'] = percentile.astype('float32')
+    return ranks.reset_index(drop=True)
+
+
+# Writes the rank index of a covid_daily_country frame sorted by (country,
+# date) as Parquet, replacing any previous file atomically
+def write_rank_index(df, path):
+    tmp_path = f'{path}.tmp'
+    rank_index(df).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from covid_data.artifact import downcast_count
+
+
+# Province/State series of the countries JHU reports by province, with each
+# country's rollup stored next to them as the region TOTAL_REGION. The
+# artifact holds one row group per country, and an index in the file's
+# metadata maps each country to its row group and regions, so a dashboard
+# reads only the countries it shows however many series there are
+
+TOTAL_REGION = 'All regions'
+
+REGION_COLUMNS = [
+    'country',
+    'region',
+    'date',
+    'cases',
+    'new_cases_smoothed',
+    'deaths',
+    'new_deaths_smoothed',
+]
+
+INDEX_KEY = b'covid_regions'
+
+
+# Sorts by country, then the rollup ahead of the regions in name order, then
+# date, and shrinks the counts as compact_country does. Names stay strings, so
+# that each row group only stores the names in it
+def compact_regions(df):
+    df = df[REGION_COLUMNS].copy()
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.assign(_leaf=df['region'] != TOTAL_REGION)
+    df = df.sort_values(['country', '_leaf', 'region', 'date']).drop(columns='_leaf')
+
+    for column in REGION_COLUMNS[3:]:
+        df[column] = downcast_count(df[column])
+    return df.reset_index(drop=True)
+
+
+# Writes the compact frame as Parquet, one row group per country, replacing
+# any previous artifact atomically
+def write_region_artifact(df, path):
+    df = compact_regions(df)
+    index = {'row_groups': {}, 'regions': {}}
+    tables = []
+    for country, rows in df.groupby('country', sort=False):
+        index['row_groups'][country] = len(tables)
+        index['regions'][country] = list(dict.fromkeys(rows['region']))
+        tables.append(pa.Table.from_pandas(rows, preserve_index=False))
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    schema = schema.with_metadata(
+        {**schema.metadata, INDEX_KEY: json.dumps(index).encode()}
+    )
+    tmp_path = f'{path}.tmp'
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for table in tables:
+            writer.write_table(table.cast(schema), row_group_size=len(table))
+    os.replace(tmp_path, path)
+    return path
+
+
+# Country -> its regions, the rollup first, read from the file's metadata only
+def read_region_index(path):
+    metadata = pq.read_schema(path).metadata
+    return json.loads(metadata[INDEX_KEY])['regions']
+
+
+# Every row of one country, read from its row group
+def read_region_rows(path, country):
+    file = pq.ParquetFile(path)
+    index = json.loads(file.schema_arrow.metadata[INDEX_KEY])
+    df = file.read_row_group(index['row_groups'][country]).to_pandas()
+    return df.astype({'country': 'category', 'region': 'category'})
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+
+TRENDLINE_KEYS = ['measure_x', 'measure_y', 'log_x', 'log_y', 'date']
+
+
+# Closed-form OLS of y on x across countries for every date, over the
+# (date, country) values selected by mask
+def _fit(x, y, mask):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = np.where(mask, x, 0.0)
+        y = np.where(mask, y, 0.0)
+
+        n = mask.sum(axis=1)
+        mean_x = x.sum(axis=1) / n
+        mean_y = y.sum(axis=1) / n
+        dx = np.where(mask, x - mean_x[:, None], 0.0)
+        dy = np.where(mask, y - mean_y[:, None], 0.0)
+        sxx = (dx * dx).sum(axis=1)
+        syy = (dy * dy).sum(axis=1)
+        sxy = (dx * dy).sum(axis=1)
+
+        slope = sxy / sxx
+        intercept = mean_y - slope * mean_x
+        r_squared = sxy * sxy / (sxx * syy)
+
+    # At least two distinct points are needed for a line
+    undefined = (n < 2) | (sxx == 0)
+    slope[undefined] = np.nan
+    intercept[undefined] = np.nan
+    r_squared[undefined] = np.nan
+    return slope, intercept, r_squared, n
+
+
+# Fits y = slope * x + intercept across countries for every date of the cube and
+# every (measure_x, measure_y, log_x, log_y) pair, vectorized over the dates
+# and countries of one pair at a time, so that the temporaries are the size of
+# a single metric's (date, country) array. Log variants fit log10(x) and/or
+# log10(y), as plotly's OLS trendline does, and offset is added to both
+# measures before fitting. Returns one row per pair and date with the slope,
+# intercept, R^2 and number of countries fitted
+def fit_trendlines(cube, pairs, min_population=None, offset=0):
+    eligible = cube.present
+    if min_population is not None:
+        eligible = eligible & (cube.columns['population'] > min_population)
+
+    n_dates = len(cube.dates)
+    frames = []
+    for measure_x, measure_y, log_x, log_y in pairs:
+        x = cube.columns[measure_x].astype('float64') + offset
+        y = cube.columns[measure_y].astype('float64') + offset
+        mask = eligible & ~np.isnan(x) & ~np.isnan(y)
+        if log_x:
+            mask &= x > 0
+            x = np.log10(x, where=mask, out=np.zeros_like(x))
+        if log_y:
+            mask &= y > 0
+            y = np.log10(y, where=mask, out=np.zeros_like(y))
+
+        slope, intercept, r_squared, n = _fit(x, y, mask)
+        frames.append(
+            pd.DataFrame(
+                {
+                    'measure_x': measure_x,
+                    'measure_y': measure_y,
+                    'log_x': np.full(n_dates, bool(log_x)),
+                    'log_y': np.full(n_dates, bool(log_y)),
+                    'date': cube.dates,
+                    'slope': slope,
+                    'intercept': intercept,
+                    'r_squared': r_squared,
+                    'n': n,
+                }
+            )
+        )
+    df = pd.concat(frames, ignore_index=True)
+    return df.set_index(TRENDLINE_KEYS).sort_index()
+
+
+# Fitted line for one pair and date, or None if nothing could be fitted
+def trendline(table, measure_x, measure_y, date, log_x=False, log_y=False):
+    key = (measure_x, measure_y, log_x, log_y, pd.Timestamp(date))
+    if key not in table.index:
+        return None
+    row = table.loc[key]
+    if np.isnan(row['slope']):
+        return None
+    return row
+
+
+# Evaluates a fitted line at x, undoing the log transforms
+def predict(row, x, log_x=False, log_y=False):
+    x = np.asarray(x, dtype='float64')
+    y = row['slope'] * (np.log10(x) if log_x else x) + row['intercept']
+    return np.power(10, y) if log_y else y
@@ -0,0 +1,72 @@
+import pandas as pd
+
+from covid_data.loader import connect_database
+
+
+# Slices of the covid_daily_country and covid_daily_global views, queried from
+# the local SQLite database. The WHERE clause is applied inside the views'
+# joins, so only the matching rows of each table are read
+
+
+def _view_columns(connection, view):
+    return [row[1] for row in connection.execute(f'PRAGMA table_info({view})')]
+
+
+def _query(view, keys, columns, where, params, order_by):
+    connection = connect_database()
+    if columns is None:
+        columns = _view_columns(connection, view)
+    else:
+        unknown = set(columns) - set(_view_columns(connection, view))
+        if unknown:
+            raise ValueError(f'unknown {view} columns: {sorted(unknown)}')
+        columns = keys + [column for column in columns if column not in keys]
+
+    sql = f'SELECT {", ".join(columns)} FROM {view}'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += f' ORDER BY {order_by}'
+
+    df = pd.read_sql_query(sql, connection, params=params)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def _date_param(date):
+    return pd.Timestamp(date).strftime('%Y-%m-%d')
+
+
+# One country's rows, in date order
+def query_country(country, columns=None):
+    return _query(
+        'covid_daily_country',
+        ['country', 'date'],
+        columns,
+        ['country = ?'],
+        [country],
+        'date',
+    )
+
+
+# Every country's row for one date, in country order
+def query_date(date, columns=None):
+    return _query(
+        'covid_daily_country',
+        ['country', 'date'],
+        columns,
+        ['date = ?'],
+        [_date_param(date)],
+        'country',
+    )
+
+
+# Global rows between start and end (inclusive), in date order
+def query_global(start=None, end=None, columns=None):
+    where, params = [], []
+    if start is not None:
+        where.append('date >= ?')
+        params.append(_date_param(start))
+    if end is not None:
+        where.append('date <= ?')
+        params.append(_date_param(end))
+    return _query('covid_daily_global', ['date'], columns, where, params, 'date')
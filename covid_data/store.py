@@ -0,0 +1,37 @@
+import numpy as np
+
+
+# Country-partitioned view over a covid_daily_country frame sorted by
+# (country, date). Each country maps to its contiguous row range, so getting a
+# single country's rows is a slice rather than a scan of the whole frame.
+# Frames sorted by another key column (such as region) are partitioned by key
+class CountryStore:
+    def __init__(self, df, key='country'):
+        self.df = df
+
+        values = df[key].to_numpy()
+        bounds = np.flatnonzero(values[1:] != values[:-1]) + 1
+        starts = np.concatenate([[0], bounds]) if len(df) else bounds
+        stops = np.concatenate([bounds, [len(df)]]) if len(df) else bounds
+
+        self.ranges = {
+            values[start]: (int(start), int(stop)) for start, stop in zip(starts, stops)
+        }
+        if len(self.ranges) != len(starts):
+            raise ValueError(f'{key} data must be sorted by {key} and date')
+
+        self.countries = list(self.ranges)
+
+    def __contains__(self, country):
+        return country in self.ranges
+
+    # All rows of one country
+    def get(self, country):
+        start, stop = self.ranges[country]
+        return self.df.iloc[start:stop]
+
+    # date plus the given columns for one country, dropping rows where any of
+    # those columns is missing
+    def series(self, country, columns):
+        df = self.get(country)[['date', *columns]]
+        return df.dropna(subset=columns)
@@ -0,0 +1,70 @@
+import pandas as pd
+
+
+# The covid_daily_global view computed from the country data itself, so the
+# global numbers are always the sum of the countries shown on the country page
+
+# Country columns the global totals are summed from
+GLOBAL_SOURCE_COLUMNS = [
+    'cases',
+    'deaths',
+    'recovered',
+    'new_cases_smoothed',
+    'new_deaths_smoothed',
+    'new_recovered_smoothed',
+]
+
+GLOBAL_COLUMNS = [
+    'date',
+    'cases',
+    'deaths',
+    'recovered',
+    'new_cases',
+    'new_deaths',
+    'new_recovered',
+    'active',
+    'case_fatality_rate',
+]
+
+
+# SUM over the rows with a recovered row joined on each date, or NULL if any
+# of them is NULL (the view's COUNT(cr.recovered) < COUNT(cr.country) rule).
+# Also used by covid_etl.views to build the view itself
+def sum_if_complete(values, joined, dates):
+    missing = (joined & values.isna()).groupby(dates).any()
+    total = values.where(joined).groupby(dates).sum(min_count=1)
+    return total.where(~missing)
+
+
+# Cases, deaths and recoveries summed over countries by date, as in
+# covid_daily_global. JHU reports recoveries on the same dates for every
+# country it has them for, so a row has a recovered row joined to it when its
+# country has any recoveries and its date is within the dates any country has
+# recoveries on
+def global_totals(store):
+    df = store.df
+    dates = df['date']
+    # Summed in float64, as the compact artifact stores some counts in float32
+    values = df[GLOBAL_SOURCE_COLUMNS].astype('float64')
+
+    reported = values['recovered'].notna()
+    covered = reported.groupby(df['country'], observed=True).transform('any')
+    joined = covered & dates.between(dates[reported].min(), dates[reported].max())
+
+    sums = values.groupby(dates).sum(min_count=1)
+    glob = pd.DataFrame(
+        {
+            'cases': sums['cases'],
+            'deaths': sums['deaths'],
+            'recovered': sum_if_complete(values['recovered'], joined, dates),
+            'new_cases': sums['new_cases_smoothed'],
+            'new_deaths': sums['new_deaths_smoothed'],
+            'new_recovered': sum_if_complete(
+                values['new_recovered_smoothed'], joined, dates
+            ),
+        }
+    )
+
+    glob['active'] = glob['cases'] - glob['deaths'] - glob['recovered']
+    glob['case_fatality_rate'] = glob['deaths'] / glob['cases'] * 100000
+    return glob.reset_index()[GLOBAL_COLUMNS]
@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from functools import wraps
+
+import pandas as pd
+
+
+# Timing spans around the dashboards' data loading and chart building. A page
+# opens a trace for each rerun, and spans are only recorded while one is open:
+# outside a trace, span() and @instrumented functions cost a single attribute
+# lookup. COVID_TRACE=1 traces every rerun and logs it as one line of JSON on
+# the covid_data.trace logger (to stderr). COVID_TRACE_MEMORY=1 also records
+# the peak memory allocated in each span, through tracemalloc, which slows
+# every allocation down while it runs
+
+TRACE_LOGS = os.environ.get('COVID_TRACE', '') not in ('', '0')
+TRACE_MEMORY = os.environ.get('COVID_TRACE_MEMORY', '') not in ('', '0')
+
+logger = logging.getLogger(__name__)
+if TRACE_LOGS:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# The trace open in each thread (Streamlit runs each session's reruns on a
+# thread of its own)
+_local = threading.local()
+
+
+# The shared figure cache's counters (covid_data.figures imports this module,
+# so it is imported here when first needed)
+def _figure_cache_stats():
+    from covid_data.figures import figure_cache
+
+    return figure_cache.stats()
+
+
+# The spans recorded during one rerun, in the order they started. Each span
+# has its name, nesting depth, start (from the start of the trace) and wall
+# time in seconds, and with memory, the peak bytes allocated above the level
+# it started at. figure_cache holds the figure cache's hits and misses during
+# the trace (in any session) and its size when the trace finished
+class Trace:
+    def __init__(self, name, memory=False):
+        self.name = name
+        self.id = uuid.uuid4().hex[:12]
+        self.timestamp = datetime.now(timezone.utc)
+        self.memory = memory
+        self.spans = []
+        self.seconds = None
+        self.peak_bytes = None
+        self.figure_cache = None
+        self._figure_cache_start = _figure_cache_stats()
+        self._depth = 0
+        self._start = time.perf_counter()
+
+        # tracemalloc keeps a single peak, so it is reset when a span starts
+        # and each open span keeps the highest peak seen before its children
+        # reset it
+        if memory:
+            self._base = tracemalloc.get_traced_memory()[0]
+            self._peaks = [0]
+            tracemalloc.reset_peak()
+
+    @contextmanager
+    def span(self, name):
+        record = {
+            'name': name,
+            'depth': self._depth,
+            'start': time.perf_counter() - self._start,
+        }
+        self.spans.append(record)
+        self._depth += 1
+        if self.memory:
+            base, peak = tracemalloc.get_traced_memory()
+            self._peaks[-1] = max(self._peaks[-1], peak)
+            self._peaks.append(0)
+            tracemalloc.reset_peak()
+
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - started
+            self._depth -= 1
+            if self.memory:
+                peak = max(tracemalloc.get_traced_memory()[1], self._peaks.pop())
+                self._peaks[-1] = max(self._peaks[-1], peak)
+                record['peak_bytes'] = peak - base
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._start
+        stats = _figure_cache_stats()
+        for counter in ['hits', 'misses']:
+            stats[counter] -= self._figure_cache_start[counter]
+        self.figure_cache = stats
+        if self.memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self._peaks[0])
+            self.peak_bytes = peak - self._base
+
+    def to_dict(self):
+        record = {
+            'trace': self.name,
+            'id': self.id,
+            'timestamp': self.timestamp.isoformat(timespec='milliseconds'),
+            'seconds': self.seconds,
+            'spans': self.spans,
+            'figure_cache': self.figure_cache,
+        }
+        if self.memory:
+            record['peak_bytes'] = self.peak_bytes
+        return record
+
+    # One row per span, indented by depth, with its share of the whole trace
+    def table(self):
+        df = pd.DataFrame(self.spans, columns=['name', 'depth', 'start', 'seconds'])
+        table = pd.DataFrame(
+            {
+                'span': [
+                    '· ' * depth + name for name, depth in zip(df['name'], df['depth'])
+                ],
+                'start (ms)': (df['start'] * 1000).round(1),
+                'time (ms)': (df['seconds'] * 1000).round(1),
+                'share': (df['seconds'] / self.seconds).round(3),
+            }
+        )
+        if self.memory:
+            peaks = [span['peak_bytes'] for span in self.spans]
+            table['peak (MB)'] = (pd.Series(peaks, dtype='float64') / 2**20).round(2)
+        return table
+
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+
+# Opens the trace of a rerun, replacing any left open by a rerun that failed.
+# Nothing is recorded unless enabled or COVID_TRACE is set
+def start_trace(name, enabled=False):
+    if not (enabled or TRACE_LOGS):
+        _local.trace = None
+        return None
+    if TRACE_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _local.trace = Trace(name, memory=TRACE_MEMORY)
+    return _local.trace
+
+
+# Closes the open trace, logging it with COVID_TRACE set, and returns it
+def finish_trace():
+    trace = current_trace()
+    _local.trace = None
+    if trace is None:
+        return None
+    trace.finish()
+    if TRACE_LOGS:
+        logger.info(json.dumps(trace.to_dict()))
+    return trace
+
+
+_no_span = nullcontext()
+
+
+# A span of the open trace, or nothing if no trace is open
+def span(name):
+    trace = current_trace()
+    if trace is None:
+        return _no_span
+    return trace.span(name)
+
+
+# Runs every call to func in a span named after it
+def instrumented(func=None, *, name=None):
+    if func is None:
+        return lambda func: instrumented(func, name=name)
+    name = name or func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        trace = getattr(_local, 'trace', None)
+        if trace is None:
+            return func(*args, **kwargs)
+        with trace.span(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+# Runs func in a span of the open trace or, when it is called with no trace
+# open (as when a Streamlit fragment reruns on its own), in a trace of its own,
+# enabled if requested() is true, that is passed to show() once it finishes
+def traced(name, requested=lambda: False, show=None):
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = current_trace()
+            if trace is not None:
+                with trace.span(name):
+                    return func(*args, **kwargs)
+
+            enabled = requested()
+            start_trace(name, enabled)
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                trace = finish_trace()
+            if enabled and show is not None:
+                show(trace)
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+# The pages' side of tracing. Streamlit is imported when these are called, so
+# that the build and the API server don't load it
+
+
+# Span breakdown of a traced rerun, shown with ?timings in the URL
+def timings_requested():
+    import streamlit as st
+
+    return 'timings' in st.query_params
+
+
+def show_timings(trace, container=None):
+    import streamlit as st
+
+    if container is None:
+        container = st
+    with container.expander('Timings', expanded=True):
+        cache = trace.figure_cache
+        st.caption(
+            f'{trace.name}: {trace.seconds * 1000:.0f} ms. Figure cache: '
+            f'{cache["hits"]} hits, {cache["misses"]} misses, {cache["entries"]} '
+            f'figures in {cache["bytes"] / 2**20:.1f} of '
+            f'{cache["max_bytes"] / 2**20:.0f} MB'
+        )
+        st.dataframe(trace.table(), hide_index=True, use_container_width=True)
+
+
+# st.plotly_chart in a span, as it serializes the figure for the browser
+@instrumented
+def plotly_chart(*args, **kwargs):
+    import streamlit as st
+
+    return st.plotly_chart(*args, **kwargs)
@@ -0,0 +1,17 @@
+from covid_etl.build import build, clean_sources, write_outputs
+from covid_etl.incremental import build_incremental
+from covid_etl.names import CountryNames, country_names
+from covid_etl.regions import build_region_view, read_jhu_regions
+from covid_etl.sources import (
+    clean_cases,
+    clean_deaths,
+    clean_hdi,
+    clean_population,
+    clean_recovered,
+    clean_stringency,
+    clean_vaccinations,
+    iter_jhu_long,
+    iter_stringency_long,
+    standardize_names,
+)
+from covid_etl.views import build_country_view, build_global_view
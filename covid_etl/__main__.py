@@ -0,0 +1,77 @@
+import argparse
+import sys
+
+import covid_data
+
+from covid_etl.build import CLEANED_DIR, RAW_DIR, STATE_DIR, build
+from covid_etl.database import read_cleaned_tables, write_database
+from covid_etl.incremental import build_incremental
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m covid_etl',
+        description='Build the dashboard datasets from the raw data.',
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser(
+        'build',
+        help='rebuild covid_daily_country, covid_daily_global and covid_daily_region',
+    )
+    build_parser.add_argument('--raw-dir', default=RAW_DIR)
+    build_parser.add_argument('--output-dir', default=covid_data.DATA_DIR)
+    build_parser.add_argument(
+        '--cleaned-dir',
+        nargs='?',
+        const=CLEANED_DIR,
+        help=f'also write the cleaned tables (default: {CLEANED_DIR})',
+    )
+    build_parser.add_argument('--state-dir', default=STATE_DIR)
+    build_parser.add_argument(
+        '--database',
+        nargs='?',
+        const=covid_data.DATABASE,
+        help=f'also write a SQLite database (default: {covid_data.DATABASE})',
+    )
+    build_parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='only process the dates added to the raw files since the last build',
+    )
+
+    build_parser.add_argument(
+        '--workers',
+        type=int,
+        help='processes cleaning sources at the same time (default: all cores)',
+    )
+
+    database_parser = subparsers.add_parser(
+        'database', help='load the cleaned tables and views into SQLite'
+    )
+    database_parser.add_argument('--cleaned-dir', default=CLEANED_DIR)
+    database_parser.add_argument('--output', default=covid_data.DATABASE)
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        run = build_incremental if args.incremental else build
+        timings = run(
+            raw_dir=args.raw_dir,
+            output_dir=args.output_dir,
+            cleaned_dir=args.cleaned_dir,
+            state_dir=args.state_dir,
+            database=args.database,
+            workers=args.workers,
+        )
+        print(timings.report())
+    elif args.command == 'database':
+        try:
+            tables = read_cleaned_tables(args.cleaned_dir)
+        except FileNotFoundError as error:
+            sys.exit(f'error: {error}')
+        write_database(tables, args.output)
+
+
+if __name__ == '__main__':
+    main()
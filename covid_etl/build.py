@@ -0,0 +1,286 @@
+import io
+import os
+import time
+import zipfile
+
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv
+
+import covid_data
+
+from covid_data.artifact import compact_country, write_country_artifact
+from covid_data.map_frames import write_map_frames
+from covid_data.mapped import COLUMNS_DIR_NAME, publish_columns, read_manifest
+from covid_data.ranks import write_rank_index
+from covid_data.regions import write_region_artifact
+from covid_data.store import CountryStore
+from covid_etl.database import write_database
+from covid_etl.regions import build_region_view
+from covid_etl.schedule import Stage, run_stages
+from covid_etl.sources import (
+    JHU_DATE_FORMAT,
+    STRINGENCY_DATE_FORMAT,
+    clean_cases,
+    clean_deaths,
+    clean_hdi,
+    clean_population,
+    clean_recovered,
+    clean_stringency,
+    clean_vaccinations,
+    raw_dates,
+)
+from covid_etl.state import (
+    TAIL_TABLES,
+    file_signature,
+    load_manifest,
+    tail_rows,
+    write_state,
+)
+from covid_etl.views import build_country_view, build_global_view
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+RAW_DIR = ROOT_DIR / 'raw_data'
+CLEANED_DIR = ROOT_DIR / 'cleaned_data'
+STATE_DIR = ROOT_DIR / 'etl_state'
+
+VACCINATIONS_URL = 'https://raw.githubusercontent.com/owid/covid-19-data/master/public/data/vaccinations/vaccinations.csv'
+
+# Cleaned table name -> (cleaning function, raw file name)
+SOURCES = {
+    'covid_cases': (clean_cases, 'time_series_covid19_confirmed_global.csv'),
+    'covid_deaths': (clean_deaths, 'time_series_covid19_deaths_global.csv'),
+    'covid_recovered': (clean_recovered, 'time_series_covid19_recovered_global.csv'),
+    'covid_vaccinations': (clean_vaccinations, 'vaccinations.csv'),
+    'stringency_index': (clean_stringency, 'stringency_index_avg.csv'),
+    'human_development_index': (
+        clean_hdi,
+        'HDR23-24_Composite_indices_complete_time_series.csv',
+    ),
+    'population': (clean_population, 'population_raw_edited.csv'),
+}
+
+# View name -> (function building it, cleaned tables it joins)
+VIEWS = {
+    'covid_daily_country': (build_country_view, list(SOURCES)),
+    'covid_daily_global': (
+        build_global_view,
+        ['covid_cases', 'covid_deaths', 'covid_recovered'],
+    ),
+}
+
+# Sources with one column per date, and the format of their date labels
+WIDE_SOURCES = {
+    'covid_cases': JHU_DATE_FORMAT,
+    'covid_deaths': JHU_DATE_FORMAT,
+    'covid_recovered': JHU_DATE_FORMAT,
+    'stringency_index': STRINGENCY_DATE_FORMAT,
+}
+
+
+# Records the wall time of each stage of a build, the stages it waited on, and
+# notes on how it ran
+class Timings(dict):
+    def __init__(self):
+        super().__init__()
+        self.deps = {}
+        self.notes = []
+
+    def stage(self, name, after=()):
+        return _Stage(self, name, after)
+
+    def record(self, name, seconds, after=()):
+        self[name] = seconds
+        self.deps[name] = list(after)
+
+    # The chain of stages, each waiting on the one before, with the longest
+    # total time, and that time. Stages are recorded after those they wait on
+    def critical_path(self):
+        finish, previous = {}, {}
+        for name, seconds in self.items():
+            before = max(self.deps[name], key=finish.get, default=None)
+            finish[name] = seconds + finish.get(before, 0)
+            previous[name] = before
+
+        name = max(finish, key=finish.get, default=None)
+        total = finish.get(name, 0)
+        path = []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return path[::-1], total
+
+    def report(self):
+        width = max(map(len, self), default=0)
+        lines = [f'{name:<{width}}  {seconds:7.2f}s' for name, seconds in self.items()]
+        lines.append(f'{"total":<{width}}  {sum(self.values()):7.2f}s')
+        if any(self.deps.values()):
+            path, total = self.critical_path()
+            lines.append(f'critical path: {" -> ".join(path)} ({total:.2f}s)')
+        return '\n'.join(self.notes + lines)
+
+
+class _Stage:
+    def __init__(self, timings, name, after):
+        self.timings = timings
+        self.name = name
+        self.after = after
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        self.timings.record(self.name, seconds, self.after)
+
+
+# The OWID vaccinations file is too large to keep in raw_data/, so it is
+# downloaded on first use
+def _raw_path(raw_dir, file_name):
+    path = Path(raw_dir) / file_name
+    if not path.exists() and file_name == 'vaccinations.csv':
+        covid_data.fetch_snapshot(VACCINATIONS_URL, path)
+    return path
+
+
+def _clean_stages(raw_dir):
+    return [
+        Stage(name, clean, (_raw_path(raw_dir, file_name),))
+        for name, (clean, file_name) in SOURCES.items()
+    ]
+
+
+# The raw files covid_daily_region is built from. It reads the province rows
+# the cleaned tables sum away, so it is built from raw data in every build
+def region_paths(raw_dir):
+    return tuple(
+        _raw_path(raw_dir, SOURCES[name][1]) for name in ('covid_cases', 'covid_deaths')
+    )
+
+
+# Cleans every source, on up to workers processes (see run_stages)
+def clean_sources(raw_dir=RAW_DIR, timings=None, workers=None):
+    timings = Timings() if timings is None else timings
+    return run_stages(_clean_stages(raw_dir), timings, workers)
+
+
+# Writes df as a latin-1 CSV inside a zip archive, replacing path atomically.
+# pyarrow's CSV writer is several times faster than DataFrame.to_csv here
+def write_csv_zip(df, path, archive_name):
+    df = df.assign(date=df['date'].dt.strftime('%Y-%m-%d'))
+    buffer = io.BytesIO()
+    pyarrow.csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), buffer)
+    data = buffer.getvalue().decode('utf-8').encode('latin-1')
+
+    tmp_path = f'{path}.tmp'
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(archive_name, data)
+    os.replace(tmp_path, path)
+
+
+def write_outputs(
+    tables, country, glob, output_dir, cleaned_dir=None, database=None, regions=None
+):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if cleaned_dir is not None:
+        Path(cleaned_dir).mkdir(parents=True, exist_ok=True)
+        for name, table in tables.items():
+            table = table.drop(columns='country_id')
+            table.to_csv(Path(cleaned_dir) / f'{name}.csv')
+    if database is not None:
+        write_database(tables, database)
+
+    write_csv_zip(
+        country, output_dir / 'covid_daily_country.zip', 'covid_daily_country.csv'
+    )
+
+    # Whole counts and a 6-decimal rate, as in the published global CSV
+    counts = glob.columns.drop(['date', 'case_fatality_rate'])
+    glob = glob.astype(dict.fromkeys(counts, 'Int64')).round({'case_fatality_rate': 6})
+    tmp_path = output_dir / 'covid_daily_global.csv.tmp'
+    glob.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, output_dir / 'covid_daily_global.csv')
+    write_country_artifact(country, output_dir / 'covid_daily_country.parquet')
+    write_map_frames(CountryStore(country), output_dir / 'covid_daily_map.npz')
+    write_rank_index(country, output_dir / 'covid_daily_rank.parquet')
+    if regions is not None:
+        write_region_artifact(regions, output_dir / 'covid_daily_region.parquet')
+
+    # Dashboards mapping the published columns switch to this build when their
+    # manifest is replaced
+    if read_manifest(output_dir / COLUMNS_DIR_NAME) is not None:
+        publish_columns(compact_country(country), output_dir / COLUMNS_DIR_NAME)
+
+
+def raw_signatures(raw_dir):
+    return {
+        name: file_signature(_raw_path(raw_dir, file_name))
+        for name, (_, file_name) in SOURCES.items()
+    }
+
+
+# Saves what build_incremental needs to continue from this build. Wide
+# sources record their last raw date column, which can be later than their
+# last cleaned row
+def save_state(state_dir, tables, country, glob, raw_dir):
+    dates = {
+        name: table['date'].max() for name, table in tables.items() if 'date' in table
+    }
+    for name, date_format in WIDE_SOURCES.items():
+        path = _raw_path(raw_dir, SOURCES[name][1])
+        dates[name] = raw_dates(path, date_format).max()
+    write_state(
+        state_dir,
+        load_manifest(state_dir),
+        tables,
+        {name: tail_rows(tables[name]) for name in TAIL_TABLES},
+        {'covid_daily_country': country, 'covid_daily_global': glob},
+        dates,
+        raw_signatures(raw_dir),
+    )
+
+
+# Rebuilds covid_daily_country, covid_daily_global and covid_daily_region from
+# raw_data/ and writes them where the dashboards read them, along with the
+# cleaned tables if cleaned_dir is given and a SQLite database of them if
+# database is given. Sources are cleaned and the views built on up to workers
+# processes. The state for later incremental builds is saved to state_dir.
+# Returns the stage timings
+def build(
+    raw_dir=RAW_DIR,
+    output_dir=covid_data.DATA_DIR,
+    cleaned_dir=None,
+    state_dir=STATE_DIR,
+    database=None,
+    workers=None,
+):
+    timings = Timings()
+    stages = _clean_stages(raw_dir)
+    stages += [
+        Stage(name, build_view, deps=inputs)
+        for name, (build_view, inputs) in VIEWS.items()
+    ]
+    stages.append(Stage('covid_daily_region', build_region_view, region_paths(raw_dir)))
+    results = run_stages(stages, timings, workers)
+    tables = {name: results[name] for name in SOURCES}
+    country, glob = results['covid_daily_country'], results['covid_daily_global']
+
+    with timings.stage('write', after=list(timings)):
+        write_outputs(
+            tables,
+            country,
+            glob,
+            output_dir,
+            cleaned_dir,
+            database,
+            regions=results['covid_daily_region'],
+        )
+    with timings.stage('state', after=['write']):
+        save_state(state_dir, tables, country, glob, raw_dir)
+
+    covid_data.clear_cache()
+    return timings
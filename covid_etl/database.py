@@ -0,0 +1,82 @@
+import os
+import sqlite3
+
+from pathlib import Path
+
+import pandas as pd
+
+
+# Embedded SQLite version of the SQL Server database behind
+# covid_queries_views.sql: the cleaned tables, indexed on the columns the views
+# join on, and the views from views.sql. Queries on a view with a WHERE clause
+# on country or date only read the matching rows of each table
+
+VIEWS_SQL = Path(__file__).resolve().parent / 'views.sql'
+
+# Cleaned table -> columns the views join it on
+JOIN_KEYS = {
+    'covid_cases': ['country', 'date'],
+    'covid_deaths': ['country', 'date'],
+    'covid_recovered': ['country', 'date'],
+    'covid_vaccinations': ['country', 'date'],
+    'stringency_index': ['country', 'date'],
+    'human_development_index': ['country', 'year'],
+    'population': ['country', 'year'],
+}
+
+
+# Reads the cleaned tables written by build(cleaned_dir=...) or the notebooks.
+# The repo only ships the HDI and population tables, so the rest are checked
+# for up front, to name every missing one at once
+def read_cleaned_tables(cleaned_dir):
+    paths = {name: Path(cleaned_dir) / f'{name}.csv' for name in JOIN_KEYS}
+    missing = [path.name for path in paths.values() if not path.exists()]
+    if missing:
+        raise FileNotFoundError(
+            f'cleaned tables missing from {cleaned_dir}: {", ".join(missing)}. '
+            'Write them with python -m covid_etl build --cleaned-dir, or build '
+            'the database from the raw data with python -m covid_etl build '
+            '--database'
+        )
+
+    tables = {}
+    for name, path in paths.items():
+        df = pd.read_csv(path, index_col=0)
+        if 'date' in df:
+            df['date'] = pd.to_datetime(df['date'])
+        tables[name] = df
+    return tables
+
+
+def _write_table(connection, name, df):
+    df = df.drop(columns='country_id', errors='ignore')
+    if 'date' in df:
+        df = df.assign(date=df['date'].dt.strftime('%Y-%m-%d'))
+
+    # Measures are stored as REAL so that the views divide as SQL Server does
+    measures = df.columns.drop(['country', 'date', 'year'], errors='ignore')
+    df = df.astype(dict.fromkeys(measures, 'float64'))
+    df.to_sql(name, connection, index=False)
+
+    keys = ', '.join(JOIN_KEYS[name])
+    connection.execute(f'CREATE INDEX {name}_keys ON {name} ({keys})')
+
+
+# Writes the cleaned tables and the views to a SQLite database at path,
+# replacing it atomically
+def write_database(tables, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    tmp_path.unlink(missing_ok=True)
+
+    connection = sqlite3.connect(tmp_path)
+    try:
+        for name in JOIN_KEYS:
+            _write_table(connection, name, tables[name])
+        connection.executescript(VIEWS_SQL.read_text())
+        connection.execute('ANALYZE')
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, path)
@@ -0,0 +1,273 @@
+from pathlib import Path
+
+import pandas as pd
+
+import covid_data
+
+from covid_etl.build import (
+    RAW_DIR,
+    SOURCES,
+    STATE_DIR,
+    WIDE_SOURCES,
+    Timings,
+    _raw_path,
+    build,
+    raw_signatures,
+    region_paths,
+    write_outputs,
+)
+from covid_etl.sources import (
+    JHU_DATE_FORMAT,
+    JHU_ID_COLUMNS,
+    _melt_dates,
+    cases_from_long,
+    deaths_from_long,
+    iter_jhu_rows,
+    raw_dates,
+    read_stringency_wide,
+    recovered_from_long,
+    stringency_from_wide,
+    sum_jhu_rows,
+)
+from covid_etl.state import (
+    TAIL_ROWS,
+    load_manifest,
+    read_cleaned,
+    read_tail,
+    read_view,
+    write_state,
+)
+from covid_etl.regions import build_region_view
+from covid_etl.views import build_country_view, build_global_view
+
+
+# Builds that only clean the date columns added to the wide raw files since
+# the last build, continuing each country from the tail saved in the state,
+# and recompute the views from the first new date on. Anything that would
+# change earlier rows falls back to a full build
+
+# JHU table -> (value column, cleaning steps after the melt, drop_negative_rows)
+JHU_TABLES = {
+    'covid_cases': ('cases', cases_from_long, False),
+    'covid_deaths': ('deaths', deaths_from_long, False),
+    'covid_recovered': ('recovered', recovered_from_long, True),
+}
+
+
+class FullRebuildRequired(Exception):
+    pass
+
+
+# The country rows of a JHU file for the date columns from after on, melted.
+# The column for after itself is only read to check it against the saved
+# tail. Rows are filtered on all columns, as in a full build, one batch of
+# countries at a time (see iter_jhu_rows)
+def _read_new_jhu(path, after, column, drop_negative_rows):
+    dates = raw_dates(path, JHU_DATE_FORMAT)
+    new = dates > after
+
+    batches = []
+    for df in iter_jhu_rows(path):
+        values = df.drop(columns=['country', *JHU_ID_COLUMNS])
+        keep = ~(values == 0).all(axis=1)
+        if drop_negative_rows:
+            negative = (values < 0).any(axis=1)
+            if (negative & ~(values.loc[:, ~new] < 0).any(axis=1)).any():
+                raise FullRebuildRequired(
+                    f'{path.name}: new negative values drop rows from earlier dates'
+                )
+            keep &= ~negative
+
+        columns = ['country', *values.columns[dates >= after]]
+        batches.append(_melt_dates(sum_jhu_rows(df.loc[keep, columns]), column))
+    return pd.concat(batches, ignore_index=True), dates.max()
+
+
+# Cleans the new rows of a JHU table with the saved tail of each country in
+# front, so that repairs, differences and moving averages continue from it.
+# Returns the new rows and the new tail
+def _append_jhu(name, new, tail, after):
+    column, from_long, _ = JHU_TABLES[name]
+    countries = tail[['country', 'country_id']].drop_duplicates()
+
+    # Countries that stopped reporting end in missing values, or before after
+    # when every country had stopped
+    last = tail.drop_duplicates('country', keep='last').set_index('country')
+    reporting = last[column].notna() & (last['date'] == after)
+    last = last[column]
+
+    # The last value of each country is never repaired, so it still equals the
+    # raw total for that date unless the raw file was revised
+    raw_last = new[new['date'] == after].set_index('country')[column]
+    revised = (raw_last.reindex(last.index) != last) & reporting
+    if revised.any():
+        raise FullRebuildRequired(f'{name}: values for {after:%Y-%m-%d} were revised')
+    new = new[new['date'] > after]
+
+    stopped = last.index[~reporting]
+    if (new.loc[new['country'].isin(stopped), column] > 0).any():
+        raise FullRebuildRequired(f'{name}: reporting resumed for a country')
+
+    # Missing tail values are dates after reporting stopped, which the
+    # cleaning adds back as missing
+    context = tail[['country', 'country_id', 'date', column]]
+    context = context.dropna(subset=[column])
+    df = pd.concat([context, new]).sort_values(['country', 'date'], kind='stable')
+    df = from_long(df.reset_index(drop=True))
+
+    added = set(df['country']) - set(countries['country'])
+    if added:
+        raise FullRebuildRequired(f'{name}: new countries {sorted(added)}')
+
+    # The tail has to come out of the cleaning unchanged, otherwise the new
+    # values revise earlier dates
+    before = df[df['date'] <= after].merge(
+        tail[['country', 'date', column]], on=['country', 'date'], how='right'
+    )
+    same = (before[f'{column}_x'] == before[f'{column}_y']) | (
+        before[f'{column}_x'].isna() & before[f'{column}_y'].isna()
+    )
+    if not same.all():
+        raise FullRebuildRequired(f'{name}: new values revise earlier dates')
+
+    # Every country of the tail continues on every new date
+    df = df[df['date'] > after]
+    full_index = countries.merge(
+        pd.DataFrame({'date': df['date'].unique()}), how='cross'
+    )
+    df = full_index.merge(
+        df.drop(columns='year'), on=['country', 'country_id', 'date'], how='left'
+    )
+    df['year'] = df['date'].dt.year
+
+    new_tail = pd.concat([tail, df]).groupby('country', sort=False).tail(TAIL_ROWS)
+    new_tail = new_tail.sort_values(['country', 'date'], kind='stable')
+    return df, new_tail.reset_index(drop=True)
+
+
+def _read_new_stringency(path, after):
+    wide = read_stringency_wide(path)
+    return stringency_from_wide(wide.loc[:, wide.columns > after]), wide.columns.max()
+
+
+def _with_new_rows(table, new):
+    if new is None or len(new) == 0:
+        return table
+    table = pd.concat([table, new]).sort_values(['country', 'date'], kind='stable')
+    return table.reset_index(drop=True)
+
+
+def _update(raw_dir, output_dir, state_dir, cleaned_dir, database, manifest, timings):
+    signatures = raw_signatures(raw_dir)
+    for name, signature in signatures.items():
+        if name not in WIDE_SOURCES and signature != manifest['signatures'][name]:
+            raise FullRebuildRequired(f'{SOURCES[name][1]} has changed')
+
+    dates = {name: pd.Timestamp(date) for name, date in manifest['dates'].items()}
+    new_tables, tails = {}, {}
+    for name, (column, _, drop_negative_rows) in JHU_TABLES.items():
+        with timings.stage(name):
+            path = _raw_path(raw_dir, SOURCES[name][1])
+            new, last_date = _read_new_jhu(
+                path, dates[name], column, drop_negative_rows
+            )
+            tail = read_tail(state_dir, manifest, name)
+            if last_date > dates[name]:
+                new, tail = _append_jhu(name, new, tail, dates[name])
+            else:
+                new = new.iloc[:0]
+            new_tables[name], tails[name] = new, tail
+            dates[name] = max(dates[name], last_date)
+
+    with timings.stage('stringency_index'):
+        path = _raw_path(raw_dir, SOURCES['stringency_index'][1])
+        after = dates['stringency_index']
+        new, last_date = _read_new_stringency(path, after)
+        new_tables['stringency_index'] = new
+        dates['stringency_index'] = max(after, last_date)
+
+    starts = [table['date'].min() for table in new_tables.values() if len(table)]
+    if not starts:
+        timings.notes.append('up to date, nothing to build')
+        return timings
+    cutoff = min(starts)
+    timings.notes.append(f'incremental build from {cutoff:%Y-%m-%d}')
+
+    # Views are recomputed from the first new date on and appended to the
+    # rows before it
+    with timings.stage('read state'):
+        tables = {}
+        for name in SOURCES:
+            tables[name] = _with_new_rows(
+                read_cleaned(state_dir, manifest, name, since=cutoff),
+                new_tables.get(name),
+            )
+        old_country = read_view(state_dir, manifest, 'covid_daily_country', cutoff)
+        old_glob = read_view(state_dir, manifest, 'covid_daily_global', cutoff)
+
+    with timings.stage('covid_daily_country'):
+        country = pd.concat([old_country, build_country_view(tables)])
+        country = country.sort_values(['country', 'date'], kind='stable')
+        country = country.reset_index(drop=True)
+    with timings.stage('covid_daily_global'):
+        glob = pd.concat([old_glob, build_global_view(tables)], ignore_index=True)
+    # Small enough to rebuild whole rather than keep state for
+    with timings.stage('covid_daily_region'):
+        regions = build_region_view(*region_paths(raw_dir))
+
+    with timings.stage('write'):
+        if cleaned_dir is not None or database is not None:
+            tables = {
+                name: _with_new_rows(
+                    read_cleaned(state_dir, manifest, name), new_tables.get(name)
+                )
+                for name in SOURCES
+            }
+        write_outputs(
+            tables, country, glob, output_dir, cleaned_dir, database, regions=regions
+        )
+    with timings.stage('state'):
+        write_state(
+            state_dir,
+            manifest,
+            new_tables,
+            tails,
+            {'covid_daily_country': country, 'covid_daily_global': glob},
+            dates,
+            signatures,
+            append=True,
+        )
+    return timings
+
+
+# Brings the outputs of an earlier build up to date with date columns added to
+# the JHU and OxCGRT files since, falling back to a full build when there is
+# no saved state or the raw data changed in any other way (on up to workers
+# processes). Returns the stage timings
+def build_incremental(
+    raw_dir=RAW_DIR,
+    output_dir=covid_data.DATA_DIR,
+    cleaned_dir=None,
+    state_dir=STATE_DIR,
+    database=None,
+    workers=None,
+):
+    raw_dir, state_dir = Path(raw_dir), Path(state_dir)
+    manifest = load_manifest(state_dir)
+    if manifest is None:
+        timings = build(raw_dir, output_dir, cleaned_dir, state_dir, database, workers)
+        timings.notes.append('no saved state, ran a full build')
+        return timings
+
+    timings = Timings()
+    try:
+        _update(
+            raw_dir, output_dir, state_dir, cleaned_dir, database, manifest, timings
+        )
+    except FullRebuildRequired as exc:
+        timings = build(raw_dir, output_dir, cleaned_dir, state_dir, database, workers)
+        timings.notes.append(f'{exc}, ran a full build')
+        return timings
+
+    covid_data.clear_cache()
+    return timings
@@ -0,0 +1,108 @@
+import contextlib
+import os
+
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import covid_data
+
+
+# Raw country names (or ISO codes) of each source mapped to country_converter's
+# short names, and a compact integer ID for every country. The table is kept
+# next to the dashboard data (COVID_DATA_DIR) so that only names no build has
+# seen before go through country_converter's regex matching. A build without
+# a table of its own starts from the one in cleaned_data/, which builds never
+# write to
+
+NAMES_PATH = covid_data.DATA_DIR / 'country_names.csv'
+SEED_PATH = (
+    Path(__file__).resolve().parent.parent / 'cleaned_data' / 'country_names.csv'
+)
+
+NOT_FOUND = 'not found'
+
+# Lock held while converting and saving new names, shared by the processes of
+# a parallel build through share_lock
+_lock = None
+
+
+def share_lock(lock):
+    global _lock
+    _lock = lock
+
+
+class CountryNames:
+    def __init__(self, path=NAMES_PATH, seed=SEED_PATH):
+        self.path = Path(path)
+        self.seed = Path(seed)
+        self.names = {}
+        self.ids = {}
+        self.read()
+
+    # Adds the names saved to the table (or the seed table until one is
+    # saved), which other processes of a parallel build may have extended
+    # since it was first read
+    def read(self):
+        path = self.path if self.path.exists() else self.seed
+        if not path.exists():
+            return
+        df = pd.read_csv(path, keep_default_na=False, dtype=str)
+        for key, country in zip(zip(df['source'], df['raw_name']), df['country']):
+            self.names.setdefault(key, country)
+        found = df[df['country'] != NOT_FOUND]
+        for country, country_id in zip(found['country'], found['country_id']):
+            self.ids.setdefault(country, int(country_id))
+
+    # Maps names from source to short names, converting unseen ones and saving
+    # them to the table
+    def standardize(self, names, source):
+        names = list(dict.fromkeys(names))
+        if any((source, name) not in self.names for name in names):
+            with _lock or contextlib.nullcontext():
+                self.read()
+                self._convert(
+                    [name for name in names if (source, name) not in self.names],
+                    source,
+                )
+        return {name: self.names[(source, name)] for name in names}
+
+    def _convert(self, unseen, source):
+        if not unseen:
+            return
+        import country_converter as coco
+
+        converted = coco.convert(names=unseen, to='name_short')
+        if isinstance(converted, str):
+            converted = [converted]
+        for name, country in zip(unseen, converted):
+            self.names[(source, name)] = country
+            if country != NOT_FOUND and country not in self.ids:
+                self.ids[country] = max(self.ids.values(), default=-1) + 1
+        self.save()
+
+    def country_ids(self, countries):
+        return np.array([self.ids[country] for country in countries], dtype='int16')
+
+    def save(self):
+        df = pd.DataFrame(
+            [
+                (source, name, country, self.ids.get(country))
+                for (source, name), country in sorted(self.names.items())
+            ],
+            columns=['source', 'raw_name', 'country', 'country_id'],
+        )
+        df['country_id'] = df['country_id'].astype('Int16')
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f'{self.path.name}.tmp')
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+
+
+# The table at NAMES_PATH, read once per process
+@lru_cache(maxsize=None)
+def country_names():
+    return CountryNames()
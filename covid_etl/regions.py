@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+from covid_data.regions import REGION_COLUMNS, TOTAL_REGION
+from covid_etl.repair import mask_inflated
+from covid_etl.sources import (
+    JHU_DATE_FORMAT,
+    JHU_ID_COLUMNS,
+    _keep_jhu_rows,
+    iter_jhu_rows,
+    standardize_names,
+)
+from covid_etl.transform import (
+    group_bounds,
+    grouped_diff,
+    grouped_interpolate,
+    grouped_rolling_mean,
+)
+
+
+# The Province/State level of the JHU cases and deaths files. Countries with a
+# country-wide row have their provinces moved out as territories (see
+# _jhu_countries), so regions come from the countries reported only by
+# province. Each region is cleaned as its own series with the steps used for
+# countries, and every country gets a rollup of its regions, summed once here
+# rather than each time a dashboard shows it
+
+
+# Province of each raw row of a country reported by two or more provinces and
+# no country-wide row, missing for every other row
+def _jhu_regions(ids, countries):
+    province = ids['Province/State'].str.strip()
+    by_province = countries.notna() & countries.duplicated(keep=False)
+    return province.where(by_province & province.notna())
+
+
+# Long (country, region, date, value) rows of the regions in a JHU file,
+# sorted by country, region and date, read one batch of countries at a time
+# (see iter_jhu_rows)
+def read_jhu_regions(path, value_name):
+    batches = []
+    for df in iter_jhu_rows(path):
+        regions = _jhu_regions(df, df['country'])
+        values = df.drop(columns=['country', *JHU_ID_COLUMNS])
+        keep = regions.notna() & _keep_jhu_rows(values, False)
+        values, countries, regions = values[keep], df['country'][keep], regions[keep]
+        countries = countries.map(standardize_names(countries.unique(), 'jhu'))
+
+        dates = pd.to_datetime(values.columns, format=JHU_DATE_FORMAT)
+        batches.append(
+            pd.DataFrame(
+                {
+                    'country': np.repeat(countries.to_numpy(), len(dates)),
+                    'region': np.repeat(regions.to_numpy(), len(dates)),
+                    'date': np.tile(dates.to_numpy(), len(values)),
+                    value_name: values.to_numpy(dtype='float64').ravel(),
+                }
+            )
+        )
+    long = pd.concat(batches, ignore_index=True)
+    return long.sort_values(['country', 'region', 'date']).reset_index(drop=True)
+
+
+# The country cleaning steps on each region's series: inflated cumulative
+# values are masked and interpolated, then the daily change is smoothed over 7
+# days into new_<column>_smoothed
+def _clean_regions(df, column):
+    series = df.groupby(['country', 'region'], sort=False).ngroup().to_numpy()
+    start, stop = group_bounds(series)
+    values = df[column].to_numpy(dtype='float64')
+    values[mask_inflated(values, start)] = np.nan
+    df[column] = grouped_interpolate(values, start, stop).round()
+
+    daily = np.nan_to_num(grouped_diff(df[column], start), nan=0.0)
+    df[f'new_{column}_smoothed'] = grouped_rolling_mean(daily, start, 7).round()
+    return df
+
+
+# The cleaned regions of each country followed by its rollup, the sum of its
+# regions on each date
+def build_region_view(cases_path, deaths_path):
+    cases = _clean_regions(read_jhu_regions(cases_path, 'cases'), 'cases')
+    deaths = _clean_regions(read_jhu_regions(deaths_path, 'deaths'), 'deaths')
+    regions = cases.merge(deaths, on=['country', 'region', 'date'], how='left')
+
+    counts = REGION_COLUMNS[3:]
+    totals = regions.groupby(['country', 'date'])[counts].sum(min_count=1)
+    totals = totals.reset_index().assign(region=TOTAL_REGION)
+    return pd.concat([totals, regions], ignore_index=True)[REGION_COLUMNS]
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+
+# Flags inflated values in a cumulative series. On every decrease the previous
+# value is flagged, along with any earlier values still above the new one
+def mask_inflated_scan(values):
+    values = np.asarray(values)
+    n = len(values)
+
+    # Create array to keep track of rows to be set to NaN
+    to_nan = np.full(shape=n, fill_value=False, dtype=bool)
+
+    # Iterate over rows to check for inflated values
+    for i in range(1, n):
+        if values[i] < values[i - 1]:
+            # Set previous value to NaN
+            to_nan[i - 1] = True
+            # Check further back
+            j = i - 2
+            while j >= 0:
+                if values[j] > values[i]:
+                    to_nan[j] = True
+                    j -= 1
+                else:
+                    break
+
+    return to_nan
+
+
+# mask_inflated_scan for every group of a frame sorted by group key at once.
+# A value is flagged exactly when a later value in its group is smaller (with
+# no missing value in between), so each value is compared with the running
+# minimum of the values after it
+def mask_inflated(values, start):
+    values = np.asarray(values, dtype='float64')
+    n = len(values)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+
+    # Missing values stop the scan, so they split groups into segments
+    missing = np.isnan(values)
+    boundary = (start == np.arange(n)) | missing
+    boundary[1:] |= missing[:-1]
+    segment = np.cumsum(boundary)
+
+    # Minimum of each value and everything after it in its segment
+    reverse = pd.Series(values[::-1])
+    suffix_min = reverse.groupby(segment[::-1]).cummin().to_numpy()[::-1]
+
+    to_nan = np.zeros(n, dtype=bool)
+    to_nan[:-1] = (values[:-1] > suffix_min[1:]) & (segment[:-1] == segment[1:])
+    return to_nan
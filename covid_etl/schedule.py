@@ -0,0 +1,84 @@
+import multiprocessing
+import time
+
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from covid_etl.names import country_names, share_lock
+
+
+# Runs the stages of a build as a dependency graph on a process pool: a stage
+# is submitted as soon as the stages it depends on have finished, so sources
+# that do not depend on each other are cleaned at the same time
+
+# func is called with args, followed by a dict of the results of the stages in
+# deps if there are any
+Stage = namedtuple('Stage', ['name', 'func', 'args', 'deps'], defaults=[(), ()])
+
+
+def _run_timed(func, args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _stage_args(stage, results):
+    if not stage.deps:
+        return stage.args
+    return (*stage.args, {name: results[name] for name in stage.deps})
+
+
+# Takes the stages whose dependencies have all finished out of pending
+def _take_ready(pending, results):
+    ready = [
+        stage
+        for stage in pending.values()
+        if all(name in results for name in stage.deps)
+    ]
+    for stage in ready:
+        del pending[stage.name]
+    return ready
+
+
+# Runs stages on up to workers processes (all cores by default, in this process
+# if 1), recording the wall time and dependencies of each in timings. Returns
+# the result of every stage by name
+def run_stages(stages, timings, workers=None):
+    pending = {stage.name: stage for stage in stages}
+    results = {}
+
+    if workers == 1:
+        while pending:
+            ready = _take_ready(pending, results)
+            if not ready:
+                raise ValueError(f'stages with missing dependencies: {list(pending)}')
+            for stage in ready:
+                results[stage.name], seconds = _run_timed(
+                    stage.func, _stage_args(stage, results)
+                )
+                timings.record(stage.name, seconds, stage.deps)
+        return results
+
+    # Workers standardizing names no build has seen yet take turns on the
+    # shared names table
+    lock = multiprocessing.Lock()
+    running = {}
+    with ProcessPoolExecutor(workers, initializer=share_lock, initargs=(lock,)) as pool:
+        while pending or running:
+            for stage in _take_ready(pending, results):
+                future = pool.submit(
+                    _run_timed, stage.func, _stage_args(stage, results)
+                )
+                running[future] = stage
+            if not running:
+                raise ValueError(f'stages with missing dependencies: {list(pending)}')
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                results[stage.name], seconds = future.result()
+                timings.record(stage.name, seconds, stage.deps)
+
+    # The workers may have added names to the table this process has cached
+    country_names.cache_clear()
+    return results
@@ -0,0 +1,448 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from covid_etl.names import NOT_FOUND, country_names
+from covid_etl.repair import mask_inflated
+from covid_etl.transform import (
+    group_bounds,
+    grouped_diff,
+    grouped_interpolate,
+    grouped_pct_change,
+    grouped_rolling_mean,
+    single_group,
+)
+
+# Cleaning for each raw source, following the steps in notebooks/. Every
+# function returns the long-format table that covid_queries_views.sql expects
+# under the same name (covid_cases, covid_deaths, ...), with an integer
+# country_id next to the country name
+
+
+# Maps raw country names (or ISO codes) of source (jhu, owid, oxcgrt, undp or
+# world_bank) to country_converter's short names, through the shared table in
+# covid_etl.names
+def standardize_names(names, source):
+    return country_names().standardize(names, source)
+
+
+# Replaces column with standardized names, dropping 'not found' rows, and adds
+# the country_id column the views join on
+def _standardize_column(df, column, source):
+    names = standardize_names(df[column].unique(), source)
+    df[column] = df[column].map(names)
+    df = df[df[column] != NOT_FOUND].copy()
+    df.insert(
+        df.columns.get_loc(column) + 1,
+        'country_id',
+        df[column].map(country_names().ids).astype('int16'),
+    )
+    return df
+
+
+# Standardizes the country names a wide frame is indexed by
+def _standardize_index(wide, source):
+    names = standardize_names(wide.index, source)
+    wide.index = wide.index.map(names)
+    return wide[wide.index != NOT_FOUND]
+
+
+# Unpivots a wide frame (one row per country, one column per date) into sorted
+# long (country, country_id, date, value) format
+def _melt_dates(wide, value_name):
+    ids = country_names().country_ids(wide.index)
+    df = pd.DataFrame(
+        {
+            'country': np.repeat(wide.index.to_numpy(), wide.shape[1]),
+            'country_id': np.repeat(ids, wide.shape[1]),
+            'date': np.tile(wide.columns.to_numpy(), wide.shape[0]),
+            value_name: wide.to_numpy(dtype='float64').ravel(),
+        }
+    )
+    return df.sort_values(by=['country', 'date']).reset_index(drop=True)
+
+
+# Labels of the date columns in the JHU and OxCGRT files (1/22/20, 01Jan2020)
+JHU_DATE_FORMAT = '%m/%d/%y'
+STRINGENCY_DATE_FORMAT = '%d%b%Y'
+
+
+# Dates of the date columns of a wide raw file, read from its header only
+def raw_dates(path, date_format):
+    columns = pd.read_csv(path, nrows=0).columns
+    dates = pd.to_datetime(columns, format=date_format, errors='coerce')
+    return dates[dates.notna()]
+
+
+def _add_year(df):
+    df['year'] = df['date'].dt.year
+    return df
+
+
+# Raw rows read at a time by the streaming readers, and date columns melted
+# at a time, which bound their batches to CHUNK_ROWS * CHUNK_DATES values
+CHUNK_ROWS = 1000
+CHUNK_DATES = 250
+CHUNK_VALUES = CHUNK_ROWS * CHUNK_DATES
+
+JHU_ID_COLUMNS = ['Province/State', 'Country/Region', 'Lat', 'Long']
+
+
+# First steps of the JHU notebook, on the ID columns: territories listed under
+# a country that also has a country-wide row are moved into Country/Region as
+# countries of their own. Returns the country of each raw row, missing for
+# rows without coordinates, which are dropped
+def _jhu_countries(ids):
+    country = ids['Country/Region'].str.strip()
+    province = ids['Province/State'].str.strip()
+
+    repeated = country.duplicated(keep=False)
+    with_country_row = country[repeated & province.isna()]
+    territories = repeated & country.isin(with_country_row) & province.notna()
+    country = country.mask(territories, province)
+
+    return country.mask(ids['Lat'].isna() | (ids['Lat'] == 0))
+
+
+# Byte offset of each data line of a CSV file, in the order read_csv numbers
+# its rows (it skips blank lines). JHU files quote no line breaks, so every
+# row is a single line
+def _line_offsets(path):
+    offsets = []
+    with open(path, 'rb') as file:
+        offset = len(file.readline())
+        for line in file:
+            if line.strip():
+                offsets.append(offset)
+            offset += len(line)
+    return np.array(offsets, dtype='int64')
+
+
+# The raw rows of a JHU file in batches of whole countries, in name order,
+# each row with its country (see _jhu_countries) in front of the raw columns.
+# The ID columns are read first to group the rows by standardized name, along
+# with the byte offset of every row, and each batch then parses only its own
+# lines (keeping the ID columns as the first read typed them), so that no
+# more than chunk_values raw values (or one country's rows, if it has more)
+# are held at a time. Rows without a country, or whose country is not found,
+# are left out
+def iter_jhu_rows(path, chunk_values=CHUNK_VALUES):
+    ids = pd.read_csv(path, usecols=JHU_ID_COLUMNS)
+    countries = _jhu_countries(ids).dropna()
+    names = countries.map(standardize_names(countries.unique(), 'jhu'))
+    names = names[names != NOT_FOUND].sort_values(kind='stable')
+    chunk_rows = max(1, chunk_values // len(pd.read_csv(path, nrows=0).columns))
+    offsets = _line_offsets(path)
+
+    batches, batch = [], []
+    for rows in names.groupby(names, sort=False).groups.values():
+        batch.extend(rows)
+        if len(batch) >= chunk_rows:
+            batches.append(batch)
+            batch = []
+    if batch:
+        batches.append(batch)
+
+    with open(path, 'rb') as file:
+        header = file.readline()
+        for batch in batches:
+            rows = np.sort(batch)
+            lines = [header]
+            for offset in offsets[rows]:
+                file.seek(offset)
+                lines.append(file.readline().rstrip(b'\r\n') + b'\n')
+            df = pd.read_csv(io.BytesIO(b''.join(lines)))
+            df.index = rows
+            df[JHU_ID_COLUMNS] = ids.loc[rows]
+            df.insert(0, 'country', countries.loc[rows])
+            yield df
+
+
+# Sums raw rows per country and standardizes the names. Returns a wide frame
+# indexed by country with one datetime column per day
+def sum_jhu_rows(df):
+    wide = df.groupby(by='country').sum()
+    wide.columns = pd.to_datetime(wide.columns, format=JHU_DATE_FORMAT)
+    return _standardize_index(wide, 'jhu')
+
+
+# Rows of only 0s, and of impossible negative values if asked, are dropped
+def _keep_jhu_rows(values, drop_negative_rows):
+    keep = ~(values == 0).all(axis=1)
+    if drop_negative_rows:
+        keep &= ~(values < 0).any(axis=1)
+    return keep
+
+
+# Steps 1-13 of the JHU notebook, the row filters and the sum of provinces,
+# as a stream of wide frames of whole countries in name order (see
+# iter_jhu_rows)
+def iter_jhu_wide(path, drop_negative_rows=False, chunk_values=CHUNK_VALUES):
+    for df in iter_jhu_rows(path, chunk_values):
+        df = df.drop(columns=JHU_ID_COLUMNS)
+        keep = _keep_jhu_rows(df.drop(columns='country'), drop_negative_rows)
+        yield sum_jhu_rows(df[keep])
+
+
+# iter_jhu_wide collected into one wide frame
+def read_jhu_wide(path, drop_negative_rows=False):
+    return pd.concat(iter_jhu_wide(path, drop_negative_rows))
+
+
+def _melt_date_blocks(wide, value_name, chunk_dates):
+    for start in range(0, wide.shape[1], chunk_dates):
+        yield _melt_dates(wide.iloc[:, start : start + chunk_dates], value_name)
+
+
+# iter_jhu_wide as a stream of long (country, country_id, date, value) batches
+# of up to chunk_dates dates
+def iter_jhu_long(
+    path,
+    value_name,
+    drop_negative_rows=False,
+    chunk_values=CHUNK_VALUES,
+    chunk_dates=CHUNK_DATES,
+):
+    for wide in iter_jhu_wide(path, drop_negative_rows, chunk_values):
+        yield from _melt_date_blocks(wide, value_name, chunk_dates)
+
+
+# Collects streamed batches into one long table sorted by country and date
+def _collect(batches):
+    df = pd.concat(batches, ignore_index=True)
+    return df.sort_values(by=['country', 'date']).reset_index(drop=True)
+
+
+# Frames with the same columns, given as dicts of column arrays, concatenated
+# one column at a time. Each batch's array is dropped once it is copied, so
+# collecting the batches takes about one column beyond the result rather than
+# a second copy of every batch
+def _concat_columns(batches):
+    df = pd.DataFrame(index=pd.RangeIndex(sum(len(batch['date']) for batch in batches)))
+    for name in list(batches[0]):
+        values = np.concatenate([batch.pop(name) for batch in batches])
+        df[name] = pd.Series(values, index=df.index, dtype=values.dtype, copy=False)
+    return df
+
+
+# Cleans each batch of iter_jhu_wide with clean(df, before) as it is read,
+# where before is the last valid value of column in the batches ahead of it,
+# and collects the cleaned batches. Only one batch of raw values is held at a
+# time
+def _clean_jhu(path, column, clean, drop_negative_rows=False):
+    before = np.nan
+    batches = []
+    for wide in iter_jhu_wide(path, drop_negative_rows):
+        df = clean(_melt_dates(wide, column), before)
+        values = df[column].dropna()
+        if len(values):
+            before = values.iloc[-1]
+        batches.append({name: df[name].to_numpy() for name in df.columns})
+    return _concat_columns(batches)
+
+
+# Masks inflated values in a cumulative column and linearly interpolates them.
+# The notebooks interpolate over the whole column, across countries, so a
+# batch of countries continues from before, the last valid value ahead of it
+# in the column. The last value of a country is never masked, so it is also
+# the batch's last valid value
+def _repair_cumulative(df, column, before=np.nan):
+    start, _ = group_bounds(df['country'])
+    values = df[column].to_numpy(dtype='float64')
+    values[mask_inflated(values, start)] = np.nan
+
+    values = np.concatenate([[before], values])
+    values = grouped_interpolate(values, *single_group(len(values)))[1:]
+    df[column] = values.round()
+    return df
+
+
+# Adds new_<name> and its 7-day moving average new_<name>_smoothed
+def _add_daily(df, column, name, fill_first=True):
+    start, _ = group_bounds(df['country'])
+    daily = grouped_diff(df[column], start)
+    if fill_first:
+        daily = np.nan_to_num(daily, nan=0.0)
+    df[f'new_{name}'] = daily
+    df[f'new_{name}_smoothed'] = grouped_rolling_mean(daily, start, 7).round()
+    return df
+
+
+def clean_cases(path):
+    return _clean_jhu(path, 'cases', cases_from_long)
+
+
+# The cleaning steps that follow the melt, shared with incremental builds.
+# before is the last valid value ahead of df (see _repair_cumulative)
+def cases_from_long(df, before=np.nan):
+    df = _repair_cumulative(df, 'cases', before)
+    df = _add_daily(df, 'cases', 'cases')
+
+    start, _ = group_bounds(df['country'])
+    df['new_cases_growth_rate'] = grouped_pct_change(df['new_cases_smoothed'], start)
+    return _add_year(df)
+
+
+def clean_deaths(path):
+    return _clean_jhu(path, 'deaths', deaths_from_long)
+
+
+def deaths_from_long(df, before=np.nan):
+    df = _repair_cumulative(df, 'deaths', before)
+    df = _add_daily(df, 'deaths', 'deaths')
+    return _add_year(df)
+
+
+# The reindex onto the full date range needs every country's dates, so it
+# runs once the repaired batches are collected
+def clean_recovered(path):
+    df = _clean_jhu(path, 'recovered', _repair_recovered, drop_negative_rows=True)
+    return _reindex_recovered(df)
+
+
+def recovered_from_long(df):
+    return _reindex_recovered(_repair_recovered(df))
+
+
+def _repair_recovered(df, before=np.nan):
+    # Drop the trailing 0s left where reporting stopped
+    trailing_max = df['recovered'][::-1].groupby(df['country'][::-1]).cummax()[::-1]
+    df = df[~((df['recovered'] <= 0) & (trailing_max == 0))]
+
+    # United Kingdom and Serbia are missing too many values
+    df = df[~df['country'].isin(['United Kingdom', 'Serbia'])]
+    return _repair_cumulative(df.reset_index(drop=True), 'recovered', before)
+
+
+def _reindex_recovered(df):
+    # Reindex every country onto the full date range
+    all_dates = pd.date_range(start=df['date'].min(), end=df['date'].max())
+    full_index = (
+        df[['country', 'country_id']]
+        .drop_duplicates()
+        .merge(pd.DataFrame({'date': all_dates}), how='cross')
+    )
+    df = pd.merge(full_index, df, on=['country', 'country_id', 'date'], how='left')
+
+    df = _add_daily(df, 'recovered', 'recovered', fill_first=False)
+    return _add_year(df)
+
+
+VACCINATION_TOTALS = [
+    'total_vaccinations',
+    'people_vaccinated',
+    'people_fully_vaccinated',
+    'total_boosters',
+]
+
+
+def clean_vaccinations(path):
+    df = pd.read_csv(
+        path,
+        usecols=[
+            'location',
+            'iso_code',
+            'date',
+            *VACCINATION_TOTALS,
+            'daily_vaccinations',
+            'daily_people_vaccinated',
+        ],
+    )
+    df = df.sort_values(by=['location', 'date'], kind='stable').reset_index(drop=True)
+
+    # Interpolate the gaps between reported totals within each location
+    start, stop = group_bounds(df['location'])
+    for column in VACCINATION_TOTALS:
+        df[column] = grouped_interpolate(df[column], start, stop).round()
+
+    # Daily counts are averaged over the whole column, as in the notebook
+    whole = single_group(len(df))[0]
+    for column, name in [
+        ('people_fully_vaccinated', 'daily_people_fully_vaccinated'),
+        ('total_boosters', 'daily_boosters'),
+    ]:
+        daily = grouped_diff(df[column], start)
+        df[name] = grouped_rolling_mean(daily, whole, 7).round()
+
+    df['country'] = df['iso_code']
+    df = _standardize_column(df, 'country', 'owid')
+    df['date'] = pd.to_datetime(df['date'])
+
+    return df[
+        [
+            'country',
+            'country_id',
+            'date',
+            *VACCINATION_TOTALS,
+            'daily_vaccinations',
+            'daily_people_vaccinated',
+            'daily_people_fully_vaccinated',
+            'daily_boosters',
+        ]
+    ].reset_index(drop=True)
+
+
+def _stringency_wide(df):
+    df = df[df['jurisdiction'] == 'NAT_TOTAL']
+
+    dates = pd.to_datetime(df.columns, format=STRINGENCY_DATE_FORMAT, errors='coerce')
+    wide = df.loc[:, dates.notna()]
+    wide.index = df['country_name'].str.strip()
+    wide.columns = dates[dates.notna()]
+    return _standardize_index(wide, 'oxcgrt')
+
+
+# National stringency values as a wide frame indexed by country with one
+# datetime column per day
+def read_stringency_wide(path):
+    return _stringency_wide(pd.read_csv(path))
+
+
+# The national rows of the OxCGRT file as a stream of long (country,
+# country_id, date, stringency_value) batches, reading chunk_rows raw rows at a
+# time
+def iter_stringency_long(path, chunk_rows=CHUNK_ROWS, chunk_dates=CHUNK_DATES):
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        wide = _stringency_wide(chunk)
+        for df in _melt_date_blocks(wide, 'stringency_value', chunk_dates):
+            yield df.dropna()
+
+
+def clean_stringency(path):
+    return _collect(iter_stringency_long(path))
+
+
+def stringency_from_wide(wide):
+    df = _melt_dates(wide, 'stringency_value')
+    return df.dropna().reset_index(drop=True)
+
+
+def clean_hdi(path):
+    df = pd.read_csv(path, encoding='latin-1')
+    df = df[['country', 'hdi_2020', 'hdi_2021', 'hdi_2022']].dropna()
+    df = _standardize_column(df, 'country', 'undp')
+
+    df = df.rename(columns={'hdi_2020': 2020, 'hdi_2021': 2021, 'hdi_2022': 2022})
+    df = pd.melt(
+        df, id_vars=['country', 'country_id'], var_name='year', value_name='hdi_value'
+    )
+    df['year'] = df['year'].astype(int)
+    return df.sort_values(['country', 'year']).reset_index(drop=True)
+
+
+def clean_population(path):
+    # The first four rows hold World Bank metadata, not data
+    df = pd.read_csv(path, skiprows=4)
+    df = df[['Country Name', '2020', '2021', '2022', '2023']].dropna()
+    df = df.rename(columns={'Country Name': 'country'})
+    df = _standardize_column(df, 'country', 'world_bank')
+
+    df = pd.melt(
+        df,
+        id_vars=['country', 'country_id'],
+        var_name='year',
+        value_name='population',
+    )
+    df['year'] = df['year'].astype(int)
+    return df.sort_values(['country', 'year']).reset_index(drop=True)
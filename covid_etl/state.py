@@ -0,0 +1,132 @@
+import json
+import os
+
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+
+# What a build leaves behind for the next incremental build: the cleaned
+# tables (appended as parquet parts), the last rows of each country for the
+# JHU tables, the full-precision views and a manifest listing them. The
+# manifest is written last, so a build that stops half way leaves the previous
+# state in place
+
+STATE_VERSION = 2
+
+# Tables whose cleaning carries values over from one day to the next
+TAIL_TABLES = ('covid_cases', 'covid_deaths', 'covid_recovered')
+
+# Trailing rows kept per country: the new day's 7-day moving average and
+# growth rate need the six days before it and the day before that
+TAIL_ROWS = 8
+
+
+def file_signature(path):
+    stat = Path(path).stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_manifest(state_dir):
+    try:
+        manifest = json.loads((Path(state_dir) / 'manifest.json').read_text())
+    except FileNotFoundError:
+        return None
+    if manifest.get('version') != STATE_VERSION:
+        return None
+    return manifest
+
+
+def tail_rows(table):
+    return table.groupby('country', sort=False).tail(TAIL_ROWS).reset_index(drop=True)
+
+
+def _write_parquet(df, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _read_parquet(state_dir, files, filters=None):
+    paths = [str(Path(state_dir) / name) for name in files]
+    return pq.ParquetDataset(paths, filters=filters).read().to_pandas()
+
+
+# Rows of a cleaned table, only those dated on or after since if given
+def read_cleaned(state_dir, manifest, name, since=None):
+    filters = None
+    if since is not None and name in manifest['dates']:
+        filters = [('date', '>=', pd.Timestamp(since))]
+    df = _read_parquet(state_dir, manifest['parts'][name], filters)
+    if name in manifest['dates'] and len(manifest['parts'][name]) > 1:
+        df = df.sort_values(['country', 'date'], kind='stable')
+    return df.reset_index(drop=True)
+
+
+def read_tail(state_dir, manifest, name):
+    return _read_parquet(state_dir, [manifest['tails'][name]])
+
+
+# The covid_daily_country or covid_daily_global view, only the rows dated
+# before until if given
+def read_view(state_dir, manifest, name, until=None):
+    filters = None if until is None else [('date', '<', pd.Timestamp(until))]
+    return _read_parquet(state_dir, [manifest['views'][name]], filters)
+
+
+# Writes the cleaned tables as new parts (appended to the parts listed in the
+# previous manifest if append), the tails and views, then the manifest. Files
+# no longer listed in the manifest are removed afterwards
+def write_state(
+    state_dir, manifest, tables, tails, views, dates, signatures, append=False
+):
+    state_dir = Path(state_dir)
+    generation = manifest['generation'] + 1 if manifest else 1
+    parts = {}
+    if append:
+        parts = {name: list(files) for name, files in manifest['parts'].items()}
+
+    for name, table in tables.items():
+        if append and len(table) == 0:
+            continue
+        file_name = f'cleaned/{name}/part-{generation}.parquet'
+        _write_parquet(table, state_dir / file_name)
+        parts.setdefault(name, []).append(file_name)
+
+    tail_files = {}
+    for name, tail in tails.items():
+        tail_files[name] = f'tails/{name}-{generation}.parquet'
+        _write_parquet(tail, state_dir / tail_files[name])
+
+    view_files = {}
+    for name, view in views.items():
+        view_files[name] = f'views/{name}-{generation}.parquet'
+        _write_parquet(view, state_dir / view_files[name])
+
+    new_manifest = {
+        'version': STATE_VERSION,
+        'generation': generation,
+        'dates': {name: date.strftime('%Y-%m-%d') for name, date in dates.items()},
+        'signatures': signatures,
+        'parts': parts,
+        'tails': tail_files,
+        'views': view_files,
+    }
+    tmp_path = state_dir / 'manifest.json.tmp'
+    tmp_path.write_text(json.dumps(new_manifest, indent=2))
+    os.replace(tmp_path, state_dir / 'manifest.json')
+
+    listed = {
+        state_dir / name
+        for name in [
+            *sum(parts.values(), []),
+            *tail_files.values(),
+            *view_files.values(),
+        ]
+    }
+    for path in state_dir.glob('*/**/*.parquet'):
+        if path not in listed:
+            path.unlink()
+    return new_manifest
@@ -0,0 +1,89 @@
+import numpy as np
+
+
+# Group-aware array operations for long frames sorted by a group key (usually
+# country). Each takes the per-row group bounds from group_bounds() instead of
+# running a Python function per group through groupby(...).apply
+
+
+# First row (inclusive) and last row (exclusive) of each row's group
+def group_bounds(keys):
+    keys = np.asarray(keys)
+    n = len(keys)
+    if n == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+    is_first = np.ones(n, dtype=bool)
+    is_first[1:] = keys[1:] != keys[:-1]
+    firsts = np.flatnonzero(is_first)
+    lengths = np.diff(np.append(firsts, n))
+    start = np.repeat(firsts, lengths)
+    stop = np.repeat(firsts + lengths, lengths)
+    return start, stop
+
+
+# Bounds that treat the whole array as a single group
+def single_group(n):
+    return np.zeros(n, dtype=int), np.full(n, n, dtype=int)
+
+
+# values[i] - values[i - 1], NaN on the first row of each group
+def grouped_diff(values, start):
+    values = np.asarray(values, dtype='float64')
+    out = np.full(len(values), np.nan)
+    out[1:] = values[1:] - values[:-1]
+    out[start == np.arange(len(values))] = np.nan
+    return out
+
+
+# values[i] / values[i - 1] - 1, NaN on the first row of each group
+def grouped_pct_change(values, start):
+    values = np.asarray(values, dtype='float64')
+    out = np.full(len(values), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[1:] = values[1:] / values[:-1] - 1
+    out[start == np.arange(len(values))] = np.nan
+    return out
+
+
+# Trailing rolling mean over up to window rows of the same group, skipping
+# NaNs, matching rolling(window, min_periods).mean() applied per group
+def grouped_rolling_mean(values, start, window, min_periods=1):
+    values = np.asarray(values, dtype='float64')
+    valid = ~np.isnan(values)
+    sums = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+
+    end = np.arange(1, len(values) + 1)
+    begin = np.maximum(end - window, start)
+    total = sums[end] - sums[begin]
+    count = counts[end] - counts[begin]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = total / count
+    out[count < min_periods] = np.nan
+    return out
+
+
+# Linear interpolation of NaNs between the valid values of each group, treating
+# rows as equally spaced. Leading NaNs are kept and trailing NaNs take the last
+# valid value, matching Series.interpolate(method='linear') per group
+def grouped_interpolate(values, start, stop):
+    values = np.asarray(values, dtype='float64')
+    n = len(values)
+    positions = np.arange(n)
+    valid = ~np.isnan(values)
+
+    before = np.maximum.accumulate(np.where(valid, positions, -1))
+    after = np.minimum.accumulate(np.where(valid, positions, n)[::-1])[::-1]
+    has_before = ~valid & (before >= start)
+    has_after = has_before & (after < stop)
+
+    out = values.copy()
+    out[has_before] = values[before[has_before]]
+
+    # Same operation order as np.interp, so results agree to the last bit
+    lo, hi, x = before[has_after], after[has_after], positions[has_after]
+    slope = (values[hi] - values[lo]) / (hi - lo)
+    out[has_after] = slope * (x - lo) + values[lo]
+    return out
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+from covid_data.totals import GLOBAL_COLUMNS, sum_if_complete
+
+
+# pandas equivalents of the views in covid_queries_views.sql, built from the
+# cleaned tables returned by covid_etl.sources
+
+COUNTRY_COLUMNS = [
+    'country',
+    'date',
+    'cases',
+    'new_cases_smoothed',
+    'new_cases_growth_rate',
+    'deaths',
+    'new_deaths_smoothed',
+    'recovered',
+    'new_recovered_smoothed',
+    'people_vaccinated',
+    'people_fully_vaccinated',
+    'total_vaccinations',
+    'total_boosters',
+    'daily_people_vaccinated',
+    'daily_people_fully_vaccinated',
+    'daily_vaccinations',
+    'daily_boosters',
+    'population',
+    'stringency_value',
+    'hdi_value',
+    'active',
+    'infection_rate',
+    'people_vaccinated_rate',
+    'fully_vaccinated_rate',
+    'case_incidence_rate',
+    'case_fatality_rate',
+    'active_case_rate',
+]
+
+
+# cases - deaths - recovered, NULL when recovered is missing or the result is
+# negative
+def _active(cases, deaths, recovered):
+    active = cases - deaths - recovered
+    return active.where(active >= 0)
+
+
+# A cleaned table without its country name, which the views take from
+# covid_cases after joining on country_id
+def _without_name(table, keys):
+    dropped = ['country'] if 'year' in keys else ['country', 'year']
+    return table.drop(columns=dropped, errors='ignore')
+
+
+# covid_daily_country: cases joined to population on (country, year) and to
+# every other table on (country, date) or (country, year)
+def build_country_view(tables):
+    on_date = ['country_id', 'date']
+    on_year = ['country_id', 'year']
+
+    df = tables['covid_cases'].merge(
+        _without_name(tables['population'], on_year), on=on_year, how='inner'
+    )
+    df = df.merge(
+        tables['covid_deaths'][on_date + ['deaths', 'new_deaths_smoothed']],
+        on=on_date,
+        how='left',
+    )
+    df = df.merge(
+        tables['covid_recovered'][on_date + ['recovered', 'new_recovered_smoothed']],
+        on=on_date,
+        how='left',
+    )
+    for name in ['covid_vaccinations', 'stringency_index']:
+        df = df.merge(_without_name(tables[name], on_date), on=on_date, how='left')
+    df = df.merge(
+        _without_name(tables['human_development_index'], on_year),
+        on=on_year,
+        how='left',
+    )
+
+    per_100k = 100000 / df['population']
+    df['active'] = _active(df['cases'], df['deaths'], df['recovered'])
+    df['infection_rate'] = df['cases'] * per_100k
+    df['people_vaccinated_rate'] = df['people_vaccinated'] * per_100k
+    df['fully_vaccinated_rate'] = df['people_fully_vaccinated'] * per_100k
+    df['case_incidence_rate'] = df['new_cases_smoothed'] * per_100k
+    df['case_fatality_rate'] = df['deaths'] / df['cases'].replace(0, np.nan) * 100000
+    df['active_case_rate'] = df['active'] * per_100k
+
+    df = df.sort_values(['country', 'date']).reset_index(drop=True)
+    return df[COUNTRY_COLUMNS]
+
+
+# covid_daily_global: cases, deaths and recoveries summed over countries by date
+def build_global_view(tables):
+    on_date = ['country_id', 'date']
+    recovered = tables['covid_recovered'][
+        on_date + ['recovered', 'new_recovered_smoothed']
+    ].assign(joined=True)
+
+    df = tables['covid_cases'][on_date + ['cases', 'new_cases_smoothed']]
+    df = df.merge(
+        tables['covid_deaths'][on_date + ['deaths', 'new_deaths_smoothed']],
+        on=on_date,
+        how='left',
+    )
+    df = df.merge(recovered, on=on_date, how='left')
+    joined = df['joined'].notna()
+    dates = df['date']
+
+    sums = df.groupby('date')[
+        ['cases', 'deaths', 'new_cases_smoothed', 'new_deaths_smoothed']
+    ].sum(min_count=1)
+    glob = pd.DataFrame(
+        {
+            'cases': sums['cases'],
+            'deaths': sums['deaths'],
+            'recovered': sum_if_complete(df['recovered'], joined, dates),
+            'new_cases': sums['new_cases_smoothed'],
+            'new_deaths': sums['new_deaths_smoothed'],
+            'new_recovered': sum_if_complete(
+                df['new_recovered_smoothed'], joined, dates
+            ),
+        }
+    )
+
+    glob['active'] = glob['cases'] - glob['deaths'] - glob['recovered']
+    glob['case_fatality_rate'] = glob['deaths'] / glob['cases'] * 100000
+    return glob.reset_index()[GLOBAL_COLUMNS]
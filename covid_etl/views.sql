@@ -0,0 +1,146 @@
+/*
+SQLite versions of the covid_daily_global and covid_daily_country views in
+covid_queries_views.sql, run by covid_etl.database over the cleaned tables.
+Rates are computed on REAL columns, so / is a floating point division as in
+SQL Server. The active count is computed in a subquery rather than a
+self-join, so that a WHERE clause on the view reaches the table indexes.
+*/
+
+-- Global daily COVID cases, deaths, recoveries, and active counts
+CREATE VIEW covid_daily_global AS
+WITH global_data AS (
+	SELECT
+		cc.date,
+		SUM(cc.cases) AS cases,
+		SUM(cd.deaths) AS deaths,
+		CASE
+			WHEN COUNT(cr.recovered) < COUNT(cr.country) THEN NULL
+			ELSE SUM(cr.recovered)
+		END AS recovered,
+		SUM(cc.new_cases_smoothed) AS new_cases,
+		SUM(cd.new_deaths_smoothed) AS new_deaths,
+		CASE
+			WHEN COUNT(cr.new_recovered_smoothed) < COUNT(cr.country) THEN NULL
+			ELSE SUM(cr.new_recovered_smoothed)
+		END AS new_recovered
+	FROM
+		covid_cases AS cc
+	LEFT JOIN
+		covid_deaths AS cd
+		ON cc.country = cd.country
+		AND cc.date = cd.date
+	LEFT JOIN
+		covid_recovered AS cr
+		ON cc.country = cr.country
+		AND cc.date = cr.date
+	GROUP BY
+		cc.date
+)
+SELECT
+	date,
+	cases,
+	deaths,
+	recovered,
+	new_cases,
+	new_deaths,
+	new_recovered,
+	CASE
+		WHEN recovered IS NULL THEN NULL
+		ELSE (cases - deaths - recovered)
+	END AS active,
+	(deaths / cases) * 100000 AS case_fatality_rate
+FROM
+	global_data
+;
+
+
+-- COVID daily data on the country-level
+CREATE VIEW covid_daily_country AS
+SELECT
+	country,
+	date,
+	cases,
+	new_cases_smoothed,
+	new_cases_growth_rate,
+	deaths,
+	new_deaths_smoothed,
+	recovered,
+	new_recovered_smoothed,
+	people_vaccinated,
+	people_fully_vaccinated,
+	total_vaccinations,
+	total_boosters,
+	daily_people_vaccinated,
+	daily_people_fully_vaccinated,
+	daily_vaccinations,
+	daily_boosters,
+	population,
+	stringency_value,
+	hdi_value,
+	active,
+	infection_rate,
+	people_vaccinated_rate,
+	fully_vaccinated_rate,
+	case_incidence_rate,
+	case_fatality_rate,
+	(active / population) * 100000 AS active_case_rate
+FROM (
+	SELECT
+		cc.country,
+		cc.date,
+		cc.cases,
+		cc.new_cases_smoothed,
+		cc.new_cases_growth_rate,
+		cd.deaths,
+		cd.new_deaths_smoothed,
+		cr.recovered,
+		cr.new_recovered_smoothed,
+		cv.people_vaccinated,
+		cv.people_fully_vaccinated,
+		cv.total_vaccinations,
+		cv.total_boosters,
+		cv.daily_people_vaccinated,
+		cv.daily_people_fully_vaccinated,
+		cv.daily_vaccinations,
+		cv.daily_boosters,
+		pop.population,
+		si.stringency_value,
+		hdi.hdi_value,
+		CASE
+			WHEN cr.recovered IS NULL THEN NULL
+			WHEN (cc.cases - cd.deaths - cr.recovered) < 0 THEN NULL
+			ELSE (cc.cases - cd.deaths - cr.recovered)
+		END AS active,
+		(cc.cases / pop.population) * 100000 AS infection_rate,
+		(cv.people_vaccinated / pop.population) * 100000 AS people_vaccinated_rate,
+		(cv.people_fully_vaccinated / pop.population) * 100000 AS fully_vaccinated_rate,
+		(cc.new_cases_smoothed / pop.population) * 100000 AS case_incidence_rate,
+		(cd.deaths / NULLIF(cc.cases, 0)) * 100000 AS case_fatality_rate
+	FROM
+		covid_cases AS cc
+	INNER JOIN
+		population AS pop
+		ON cc.country = pop.country
+		AND cc.year = pop.year
+	LEFT JOIN
+		covid_deaths AS cd
+		ON cc.country = cd.country
+		AND cc.date = cd.date
+	LEFT JOIN
+		covid_recovered AS cr
+		ON cc.country = cr.country
+		AND cc.date = cr.date
+	LEFT JOIN
+		covid_vaccinations AS cv
+		ON cc.country = cv.country
+		AND cc.date = cv.date
+	LEFT JOIN
+		stringency_index AS si
+		ON cc.country = si.country
+		AND cc.date = si.date
+	LEFT JOIN
+		human_development_index AS hdi
+		ON cc.country = hdi.country
+		AND cc.year = hdi.year
+)
+;
@@ -1,20 +1,38 @@
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objs as go
 import streamlit as st
 
+from covid_data import (
+    cached_figure,
+    decimate,
+    finish_trace,
+    graph_area_trace,
+    graph_stacked_traces,
+    instrumented,
+    load_global,
+    load_map_frames,
+    plotly_chart,
+    show_timings,
+    start_trace,
+    timings_requested,
+    traced,
+)
 
 # Page configuration
 st.set_page_config(layout='wide', page_title='COVID-19: Global')
 
+# Timing spans of each rerun (covid_data.trace)
+start_trace('global page', timings_requested())
+
 
 # Read in data:
-## Global data
-url_global = 'https://raw.githubusercontent.com/jamesinjune/COVID_19_Data_Exploration/refs/heads/main/visualization_data/covid_daily_global.csv'
-df_global = pd.read_csv(url_global)
+## Global totals (cached in-process, summed by date from the country data)
+df_global = load_global()
 
-df_global['date'] = pd.to_datetime(df_global['date'])
-df_global = df_global.sort_values(['date']).reset_index(drop=True)
+## Per-date values of the map's metrics for every country, precomputed when
+## the data is built: weekly key frames for the animation and daily frames
+## read on demand
+map_frames = load_map_frames()
 
 
 # Constants
@@ -30,17 +48,30 @@ metric_list = [
     'Case Fatality Rate',
 ]
 
+map_metric_list = {
+    'infection_rate': 'Infection Rate',
+    'case_fatality_rate': 'Case Fatality Rate',
+    'people_vaccinated_rate': 'People Vaccinated Rate',
+    'stringency_value': 'Stringency Index',
+}
+
 
 # Functions
-def graph_area_global(measure, color):
+# Series in the charts below are decimated to a fixed number of points and
+# drawn in WebGL if webgl is set
+@instrumented
+def graph_area_global(measure, color, webgl=False):
     df = df_global[['date', measure]].dropna()
-    fig = px.area(
-        df,
-        x='date',
-        y=measure,
-        color_discrete_sequence=[color],
-        hover_data={'date': True, measure: True},
-    )
+    if webgl:
+        fig = go.Figure(graph_area_trace(decimate(df, 'date', measure), measure, color))
+    else:
+        fig = px.area(
+            df,
+            x='date',
+            y=measure,
+            color_discrete_sequence=[color],
+            hover_data={'date': True, measure: True},
+        )
     fig.update_layout(
         xaxis_title='date',
         yaxis_title='count',
@@ -51,21 +82,31 @@ def graph_area_global(measure, color):
     return fig
 
 
-def graph_stacked_global_case():
+@instrumented
+def graph_stacked_global_case(webgl=False):
     df_glob_filtered = df_global.dropna(subset=['active'])[
         ['date', 'recovered', 'deaths', 'active']
     ]
-    df_glob_melted = df_glob_filtered.melt(
-        id_vars='date', var_name='Measure', value_name='val'
-    )
+    colors = ['#10cf51', '#ec1342', '#ff9c00']
 
-    fig = px.area(
-        df_glob_melted,
-        x='date',
-        y='val',
-        color='Measure',
-        color_discrete_sequence=['#10cf51', '#ec1342', '#ff9c00'],
-    )
+    if webgl:
+        fig = go.Figure(
+            graph_stacked_traces(
+                df_glob_filtered, ['recovered', 'deaths', 'active'], colors
+            )
+        )
+        fig.update_layout(legend_title_text='Measure')
+    else:
+        df_glob_melted = df_glob_filtered.melt(
+            id_vars='date', var_name='Measure', value_name='val'
+        )
+        fig = px.area(
+            df_glob_melted,
+            x='date',
+            y='val',
+            color='Measure',
+            color_discrete_sequence=colors,
+        )
     fig.update_layout(
         title='Total Cases Split by Recoveries, Deaths, and Active Cases',
         xaxis_title='date',
@@ -77,6 +118,7 @@ def graph_stacked_global_case():
     return fig
 
 
+@instrumented
 def graph_global_case_fatality():
     fig = px.line(
         df_global, x='date', y='case_fatality_rate', color_discrete_sequence=['#b50f33']
@@ -92,6 +134,126 @@ def graph_global_case_fatality():
     return fig
 
 
+# Choropleth of one frame of the map, on a colour scale fixed for the metric
+# so that frames compare
+def graph_map_trace(values, measure):
+    zmin, zmax = map_frames.ranges[measure]
+    return go.Choropleth(
+        locations=map_frames.iso3,
+        z=values.astype('float64').round(2),
+        text=map_frames.countries,
+        zmin=zmin,
+        zmax=zmax,
+        colorscale='Reds',
+        colorbar_title=map_metric_list[measure],
+        hovertemplate=f'%{{text}}<br>{measure}=%{{z}}<extra></extra>',
+    )
+
+
+def graph_map_layout(fig, title):
+    fig.update_layout(
+        title=title,
+        geo=dict(showframe=False, projection_type='natural earth'),
+        width=1000,
+        height=600,
+    )
+    return fig
+
+
+# Animation over the weekly key frames, played in the browser. Frames only
+# carry their values, which replace those of the first frame's trace
+@instrumented
+@cached_figure
+def graph_map_animation(measure):
+    key_frames = map_frames.key_frames(measure)
+    labels = map_frames.key_dates.strftime('%Y-%m-%d')
+    frames = [
+        go.Frame(data=[go.Choropleth(z=values.astype('float64').round(2))], name=label)
+        for values, label in zip(key_frames, labels)
+    ]
+    fig = go.Figure(graph_map_trace(key_frames[0], measure), frames=frames)
+
+    play = dict(frame=dict(duration=150, redraw=True), fromcurrent=True)
+    pause = dict(frame=dict(duration=0, redraw=False), mode='immediate')
+    fig.update_layout(
+        updatemenus=[
+            dict(
+                type='buttons',
+                direction='left',
+                x=0,
+                y=0,
+                xanchor='right',
+                yanchor='top',
+                buttons=[
+                    dict(label='Play', method='animate', args=[None, play]),
+                    dict(label='Pause', method='animate', args=[[None], pause]),
+                ],
+            )
+        ],
+        sliders=[
+            dict(
+                x=0,
+                y=0,
+                len=1,
+                currentvalue=dict(prefix='date: '),
+                steps=[
+                    dict(label=label, method='animate', args=[[label], pause])
+                    for label in labels
+                ],
+            )
+        ],
+    )
+    return graph_map_layout(fig, f'{map_metric_list[measure]} by Country (weekly)')
+
+
+# A single day of the map, from the daily frames
+@instrumented
+@cached_figure
+def graph_map_day(measure, date):
+    fig = go.Figure(graph_map_trace(map_frames.frame(measure, date), measure))
+    return graph_map_layout(
+        fig, f'{map_metric_list[measure]} by Country: {date:%Y-%m-%d}'
+    )
+
+
+@st.fragment
+@traced('world map', timings_requested, show_timings)
+def world_map_section():
+    st.header('World Map')
+
+    st.markdown(
+        '''
+        The map below shows the selected metric for every country. Press play to watch it change week by week over the pandemic, or switch to a single day to examine any date.
+        '''
+    )
+
+    col1, col2 = st.columns([0.8, 0.2])
+
+    with col1:
+        map_metric_select = st.selectbox(
+            'Select a map metric',
+            options=list(map_metric_list),
+            format_func=map_metric_list.__getitem__,
+        )
+
+    with col2:
+        single_day = st.toggle('Single day')
+
+    if single_day:
+        date_slider = st.slider(
+            'Select a date',
+            min_value=map_frames.dates[0].to_pydatetime(),
+            max_value=map_frames.dates[-1].to_pydatetime(),
+            value=map_frames.dates[-1].to_pydatetime(),
+            format='YYYY-MM-DD',
+        )
+        map_fig = graph_map_day(map_metric_select, date_slider)
+    else:
+        map_fig = graph_map_animation(map_metric_select)
+
+    plotly_chart(map_fig)
+
+
 def main():
 
     st.sidebar.markdown(
@@ -104,6 +266,11 @@ def main():
         '''
     )
 
+    webgl = st.sidebar.toggle(
+        'Fast charts',
+        help='Draws long series with fewer points, in WebGL, for slow connections and devices.',
+    )
+
     st.title('Global Statistics on COVID-19')
 
     st.markdown(
@@ -112,7 +279,7 @@ def main():
 
         - **Note**: This data was aggregated by summing country-level data to estimate worldwide numbers. Due to inconsistencies in the accurate 
         reporting of COVID-19 numbers by governments across the world, as well as missing data from various other countries, the figures below are lower than the true metric.
-        - The dataset used can be viewed [here](https://github.com/jamesinjune/COVID_19_Data_Exploration/blob/main/visualization_data/covid_daily_global.csv).
+        - The figures below are summed by date from the country-level dataset, which can be viewed [here](https://github.com/jamesinjune/COVID_19_Data_Exploration/blob/main/visualization_data/covid_daily_country.zip).
         '''
     )
 
@@ -124,8 +291,8 @@ def main():
             The **raw case count** of COVID-19 worldwide. The true value may differ due to inconsistencies in data collection as well as missing country data.
             '''
         )
-        global_cases_fig = graph_area_global('cases', '#6f6fe7')
-        st.plotly_chart(global_cases_fig)
+        global_cases_fig = graph_area_global('cases', '#6f6fe7', webgl=webgl)
+        plotly_chart(global_cases_fig)
 
     if metric_select == 'Total Deaths':
         st.markdown(
@@ -133,8 +300,8 @@ def main():
             The raw death count of COVID-19 worldwide. The true value may differ due to inconsistencies in data collection as well as missing country data.
             '''
         )
-        global_deaths_fig = graph_area_global('deaths', '#ec1342')
-        st.plotly_chart(global_deaths_fig)
+        global_deaths_fig = graph_area_global('deaths', '#ec1342', webgl=webgl)
+        plotly_chart(global_deaths_fig)
 
     if metric_select == 'Total Recoveries':
         st.markdown(
@@ -142,10 +309,8 @@ def main():
             The raw recovery count from COVID-19 worldwide. The true value may differ due to inconsistencies in data collection as well as missing country data.
             '''
         )
-        global_recovered_fig = graph_area_global(
-            'recovered', '#12ed5d'
-        )
-        st.plotly_chart(global_recovered_fig)
+        global_recovered_fig = graph_area_global('recovered', '#12ed5d', webgl=webgl)
+        plotly_chart(global_recovered_fig)
 
     if metric_select == 'Total Active Cases':
         st.markdown(
@@ -153,8 +318,8 @@ def main():
             The active case count of COVID-19 worldwide on a given date. The true value may differ due to inconsistencies in data collection as well as missing country data.
             '''
         )
-        global_active_fig = graph_area_global('active', '#ff9c00')
-        st.plotly_chart(global_active_fig)
+        global_active_fig = graph_area_global('active', '#ff9c00', webgl=webgl)
+        plotly_chart(global_active_fig)
 
     if metric_select == 'Daily New Cases':
         st.markdown(
@@ -162,10 +327,8 @@ def main():
             The count of new COVID-19 cases worldwide on a given date. The true value may differ due to inconsistencies in data collection as well as missing country data.
             '''
         )
-        global_new_cases_fig = graph_area_global(
-            'new_cases', '#6f6fe7'
-        )
-        st.plotly_chart(global_new_cases_fig)
+        global_new_cases_fig = graph_area_global('new_cases', '#6f6fe7', webgl=webgl)
+        plotly_chart(global_new_cases_fig)
 
     if metric_select == 'Daily New Deaths':
         st.markdown(
@@ -173,10 +336,8 @@ def main():
             The count of new COVID-19 deaths worldwide on a given date. The true value may differ due to inconsistencies in data collection as well as missing country data.
             '''
         )
-        global_new_deaths_fig = graph_area_global(
-            'new_deaths', '#ec1342'
-        )
-        st.plotly_chart(global_new_deaths_fig)
+        global_new_deaths_fig = graph_area_global('new_deaths', '#ec1342', webgl=webgl)
+        plotly_chart(global_new_deaths_fig)
 
     if metric_select == 'Daily New Recoveries':
         st.markdown(
@@ -185,9 +346,9 @@ def main():
             '''
         )
         global_new_recovered_fig = graph_area_global(
-            'new_recovered', '#11de57'
+            'new_recovered', '#11de57', webgl=webgl
         )
-        st.plotly_chart(global_new_recovered_fig)
+        plotly_chart(global_new_recovered_fig)
 
     if metric_select == 'Cases Breakdown: Deaths, Recoveries, and Active Cases':
         st.markdown(
@@ -195,8 +356,8 @@ def main():
             The total case count of COVID-19 worldwide, split between current active cases, recoveries, and deaths. The purpose is to investigate the proportions of each metric in relation to each other.
             '''
         )
-        global_case_stacked_fig = graph_stacked_global_case()
-        st.plotly_chart(global_case_stacked_fig)
+        global_case_stacked_fig = graph_stacked_global_case(webgl=webgl)
+        plotly_chart(global_case_stacked_fig)
 
     if metric_select == 'Case Fatality Rate':
         st.markdown(
@@ -205,7 +366,13 @@ def main():
             '''
         )
         global_case_fatality_fig = graph_global_case_fatality()
-        st.plotly_chart(global_case_fatality_fig)
+        plotly_chart(global_case_fatality_fig)
+
+    world_map_section()
+
+    trace = finish_trace()
+    if trace is not None and timings_requested():
+        show_timings(trace, st.sidebar)
 
 
 if __name__ == '__main__':
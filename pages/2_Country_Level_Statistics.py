@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objs as go
@@ -5,21 +6,133 @@ import streamlit as st
 
 from datetime import datetime
 
+from covid_data import (
+    TOTAL_REGION,
+    cached_figure,
+    decimate,
+    finish_trace,
+    graph_area_trace,
+    graph_stacked_traces,
+    instrumented,
+    load_country_coverage,
+    load_country_cube,
+    load_country_ranks,
+    load_country_regions,
+    load_country_store,
+    load_country_trendlines,
+    load_rank_index,
+    load_region_index,
+    plotly_chart,
+    predict,
+    show_timings,
+    start_trace,
+    timings_requested,
+    traced,
+    trendline,
+)
+
 # Page configuration
 st.set_page_config(layout='wide', page_title='COVID-19: Country')
 
+# Timing spans of each rerun (covid_data.trace)
+start_trace('country page', timings_requested())
 
-# Read in data:
-## Country data
-zip_url_country = 'https://github.com/jamesinjune/COVID_19_Data_Exploration/raw/refs/heads/main/visualization_data/covid_daily_country.zip'
-df_country = pd.read_csv(zip_url_country, compression='zip', encoding='latin-1')
 
-df_country['date'] = pd.to_datetime(df_country['date'])
-df_country = df_country.sort_values(['country', 'date']).reset_index(drop=True)
+# Read in data:
+## Country data (cached in-process, read from the local snapshot), limited to
+## the columns charted on this page
+country_columns = [
+    'cases',
+    'new_cases_smoothed',
+    'deaths',
+    'new_deaths_smoothed',
+    'recovered',
+    'new_recovered_smoothed',
+    'active',
+    'people_vaccinated',
+    'people_fully_vaccinated',
+    'total_vaccinations',
+    'total_boosters',
+    'daily_people_vaccinated',
+    'daily_people_fully_vaccinated',
+    'daily_vaccinations',
+    'daily_boosters',
+    'population',
+    'stringency_value',
+    'hdi_value',
+    'infection_rate',
+    'people_vaccinated_rate',
+    'fully_vaccinated_rate',
+    'case_fatality_rate',
+]
+country_store = load_country_store(country_columns)
+
+## Per-date cross-sections for the comparisons between countries
+cube_metrics = [
+    'population',
+    'hdi_value',
+    'cases',
+    'deaths',
+    'active',
+    'people_vaccinated',
+    'infection_rate',
+    'people_vaccinated_rate',
+    'fully_vaccinated_rate',
+    'case_fatality_rate',
+]
+country_cube = load_country_cube(cube_metrics, country_columns)
+
+## First and last dates with values of the metrics behind the date sliders
+coverage_metrics = [
+    'infection_rate',
+    'cases',
+    'deaths',
+    'active',
+    'people_vaccinated',
+    'hdi_value',
+    'people_vaccinated_rate',
+    'fully_vaccinated_rate',
+]
+country_coverage = load_country_coverage(coverage_metrics, country_columns)
+
+## OLS trendlines for every date of each scatterplot, fitted on the same
+## shifted (+1) values that the scatterplots display
+scatter_pairs = [
+    ('hdi_value', 'case_fatality_rate', False, True),
+    ('hdi_value', 'infection_rate', False, True),
+    ('people_vaccinated_rate', 'infection_rate', False, True),
+    ('fully_vaccinated_rate', 'infection_rate', False, True),
+]
+scatter_trendlines = load_country_trendlines(
+    scatter_pairs,
+    cube_metrics,
+    country_columns,
+    min_population=1000000,
+    offset=1,
+)
+
+## The top/bottom 15 countries of every date (population > 1,000,000), ranked
+## in one pass for the bar chart race
+race_columns = ['infection_rate', 'cases', 'deaths', 'active', 'people_vaccinated']
+country_ranks = load_country_ranks(
+    race_columns,
+    cube_metrics,
+    country_columns,
+    n=15,
+    min_population=1000000,
+)
+
+## Every country's global rank and percentile in each rate on every date,
+## precomputed when the data is built
+rank_store = load_rank_index()
+
+## Province/State regions of the countries reported by region, with their
+## precomputed rollups (each country's rows are read when it is selected)
+region_index = load_region_index()
 
 
 # Constants
-country_list = df_country['country'].unique()
+country_list = country_store.countries
 
 metric_list = [
     'Total Cases',
@@ -41,6 +154,25 @@ metric_list = [
     'Stringency Index',
 ]
 
+rank_metric_list = {
+    'infection_rate': 'Infection Rate',
+    'case_incidence_rate': 'Case Incidence Rate',
+    'case_fatality_rate': 'Case Fatality Rate',
+    'active_case_rate': 'Active Case Rate',
+    'people_vaccinated_rate': 'People Vaccinated Rate',
+    'fully_vaccinated_rate': 'Fully Vaccinated Rate',
+}
+
+# Days between the frames of the bar chart race
+race_frame_days = 7
+
+region_metric_list = {
+    'Total Cases': ('cases', '#6f6fe7'),
+    'Total Deaths': ('deaths', '#ec1342'),
+    'Daily New Cases': ('new_cases_smoothed', '#6f6fe7'),
+    'Daily New Deaths': ('new_deaths_smoothed', '#ec1342'),
+}
+
 
 # Functions
 def capitalize_to_title(string):
@@ -49,10 +181,27 @@ def capitalize_to_title(string):
     return string
 
 
-def graph_area_country(country, measure, color, title):
-    df = df_country.dropna(subset=[measure])
-    df = df[df['country'] == country]
-    fig = px.area(df, x='date', y=measure, color_discrete_sequence=[color])
+# Series in the charts below are decimated to a fixed number of points and
+# drawn in WebGL if webgl is set
+@instrumented
+@cached_figure
+def graph_area_country(country, measure, color, title, webgl=False):
+    df = country_store.series(country, [measure])
+    return graph_area(df, measure, color, title, webgl)
+
+
+@instrumented
+@cached_figure
+def graph_area_region(country, region, measure, color, title, webgl=False):
+    df = load_country_regions(country).series(region, [measure])
+    return graph_area(df, measure, color, title, webgl)
+
+
+def graph_area(df, measure, color, title, webgl=False):
+    if webgl:
+        fig = go.Figure(graph_area_trace(decimate(df, 'date', measure), measure, color))
+    else:
+        fig = px.area(df, x='date', y=measure, color_discrete_sequence=[color])
     fig.update_layout(
         title=title,
         xaxis_title='date',
@@ -64,20 +213,31 @@ def graph_area_country(country, measure, color, title):
     return fig
 
 
-def graph_stacked_country_case(country):
-    df = df_country[df_country['country'] == country].set_index('country')
+@instrumented
+@cached_figure
+def graph_stacked_country_case(country, webgl=False):
+    df = country_store.get(country)
     df_filtered = df.dropna(subset=['active'])[
         ['date', 'recovered', 'deaths', 'active']
     ]
-    df_melted = df_filtered.melt(id_vars='date', var_name='Measure', value_name='val')
-
-    fig = px.area(
-        df_melted,
-        x='date',
-        y='val',
-        color='Measure',
-        color_discrete_sequence=['#10cf51', '#ec1342', '#ff9c00'],
-    )
+    colors = ['#10cf51', '#ec1342', '#ff9c00']
+
+    if webgl:
+        fig = go.Figure(
+            graph_stacked_traces(df_filtered, ['recovered', 'deaths', 'active'], colors)
+        )
+        fig.update_layout(legend_title_text='Measure')
+    else:
+        df_melted = df_filtered.melt(
+            id_vars='date', var_name='Measure', value_name='val'
+        )
+        fig = px.area(
+            df_melted,
+            x='date',
+            y='val',
+            color='Measure',
+            color_discrete_sequence=colors,
+        )
     fig.update_layout(
         title=f'Total Cases Split by Recoveries, Deaths, Active Cases in {country}',
         xaxis_title='date',
@@ -89,9 +249,10 @@ def graph_stacked_country_case(country):
     return fig
 
 
+@instrumented
+@cached_figure
 def graph_country_stringency(country):
-    df = df_country[df_country['country'] == country]
-    df = df[['date', 'stringency_value']].dropna()
+    df = country_store.series(country, ['stringency_value'])
     fig = px.line(
         df, x='date', y='stringency_value', color_discrete_sequence=['#d97670']
     )
@@ -107,22 +268,17 @@ def graph_country_stringency(country):
 
 
 # Creates bar graphs of top/bottom 15 countries in given measure
+@instrumented
+@cached_figure
 def graph_bar_country(measure, date, is_top_n=True):
-    df = df_country[df_country['population'] > 1000000]
-    df = df[df['date'] == date]
-    df = df[['country', measure, 'hdi_value']]
-    if is_top_n == True:
-        df = (
-            df.sort_values(by=measure, ascending=False)
-            .head(15)
-            .sort_values(by=measure, ascending=True)
-        )
-    else:
-        df = (
-            df.sort_values(by=measure, ascending=True)
-            .head(15)
-            .sort_values(by=measure, ascending=False)
-        )
+    df = country_cube.top_n(
+        measure,
+        date,
+        15,
+        largest=is_top_n,
+        metrics=['hdi_value'],
+        min_population=1000000,
+    )
     df['hdi_value'] = df['hdi_value'].round(2)
     fig = px.bar(
         df,
@@ -151,14 +307,123 @@ def graph_bar_country(measure, date, is_top_n=True):
     return fig
 
 
-def graph_country_dual(country, measure_y1, measure_y2, title):
-    df = df_country[df_country['country'] == country]
-    df = df[['date', measure_y1, measure_y2]].dropna()
+# Bar chart race of the top/bottom 15 countries by measure, played in the
+# browser. Bars are placed by rank and labelled with their country, so every
+# frame only replaces the values and labels
+@instrumented
+@cached_figure
+def graph_bar_race(measure, is_top_n=True):
+    min_date, max_date = country_coverage.date_range(measure)
+    dates = pd.date_range(min_date, max_date, freq=f'{race_frame_days}D')
+    df = country_ranks.leaders(measure, largest=is_top_n, dates=dates)
+    df['value'] = df['value'].round(2)
+
+    frames = []
+    for date, rows in df.groupby('date'):
+        bars = go.Bar(
+            x=rows['value'],
+            y=rows['rank'],
+            text=rows['country'],
+            orientation='h',
+            textposition='auto',
+            hovertemplate=f'%{{text}}<br>{measure}=%{{x}}<extra></extra>',
+        )
+        high = rows['value'].max()
+        layout = go.Layout(xaxis_range=[0, high * 1.05 if high > 0 else 1])
+        frames.append(go.Frame(data=[bars], layout=layout, name=f'{date:%Y-%m-%d}'))
+    labels = [frame.name for frame in frames]
+
+    order = 'Top' if is_top_n else 'Bottom'
+    fig = go.Figure(frames[0].data, layout=frames[0].layout, frames=frames)
+    play = dict(frame=dict(duration=200, redraw=True), fromcurrent=True)
+    pause = dict(frame=dict(duration=0, redraw=True), mode='immediate')
+    fig.update_layout(
+        title=f'{order} 15 Countries by {capitalize_to_title(measure)} over Time',
+        xaxis_title=measure,
+        yaxis_title='rank',
+        yaxis=dict(autorange='reversed', dtick=1),
+        updatemenus=[
+            dict(
+                type='buttons',
+                direction='left',
+                x=0,
+                y=0,
+                xanchor='right',
+                yanchor='top',
+                buttons=[
+                    dict(label='Play', method='animate', args=[None, play]),
+                    dict(label='Pause', method='animate', args=[[None], pause]),
+                ],
+            )
+        ],
+        sliders=[
+            dict(
+                x=0,
+                y=0,
+                len=1,
+                currentvalue=dict(prefix='date: '),
+                steps=[
+                    dict(label=label, method='animate', args=[[label], pause])
+                    for label in labels
+                ],
+            )
+        ],
+        width=1000,
+        height=550,
+    )
+    return fig
+
+
+# Global rank of a country in measure over time, read from the rank index in
+# one slice, with rank 1 at the top
+@instrumented
+@cached_figure
+def graph_rank_country(country, measure, webgl=False):
+    rank, percentile = f'{measure}_rank', f'{measure}_percentile'
+    df = rank_store.series(country, [rank, percentile])
+    if webgl:
+        df = decimate(df, 'date', rank)
+    scatter = go.Scattergl if webgl else go.Scatter
+    fig = go.Figure(
+        scatter(
+            x=df['date'],
+            y=df[rank],
+            customdata=df[percentile].round(1),
+            mode='lines',
+            line=dict(color='#6f6fe7'),
+            hovertemplate=(
+                'date=%{x}<br>rank=%{y}<br>percentile=%{customdata}<extra></extra>'
+            ),
+        )
+    )
+    fig.update_layout(
+        title=f'Global Rank by {rank_metric_list[measure]}: {country}',
+        xaxis_title='date',
+        yaxis_title='rank',
+        yaxis_autorange='reversed',
+        xaxis_rangeslider_visible=True,
+        width=800,
+        height=600,
+    )
+    return fig
+
+
+@instrumented
+@cached_figure
+def graph_country_dual(country, measure_y1, measure_y2, title, webgl=False):
+    df = country_store.series(country, [measure_y1, measure_y2])
+    df_y1, df_y2 = df, df
+    scatter = go.Scatter
+    if webgl:
+        df_y1 = decimate(df, 'date', measure_y1)
+        df_y2 = decimate(df, 'date', measure_y2)
+        scatter = go.Scattergl
+
     fig = go.Figure()
     fig.add_trace(
-        go.Scatter(
-            x=df['date'],
-            y=df[measure_y1],
+        scatter(
+            x=df_y1['date'],
+            y=df_y1[measure_y1],
             fill='tozeroy',
             mode='lines',
             name=f'{measure_y1}',
@@ -166,9 +431,9 @@ def graph_country_dual(country, measure_y1, measure_y2, title):
         )
     )
     fig.add_trace(
-        go.Scatter(
-            x=df['date'],
-            y=df[measure_y2],
+        scatter(
+            x=df_y2['date'],
+            y=df_y2[measure_y2],
             mode='lines',
             name=f'{measure_y2}',
             yaxis='y2',
@@ -187,59 +452,77 @@ def graph_country_dual(country, measure_y1, measure_y2, title):
     return fig
 
 
+@instrumented
+@cached_figure
 def hdi_dist(date):
-    df = df_country[df_country['date'] == date]
+    df = country_cube.cross_section(date, ['hdi_value'])
     fig = px.box(df, x='hdi_value')
     fig.update_layout(width=1000, height=400)
     return fig
 
 
+@instrumented
+@cached_figure
 def graph_scatter(measure_x, measure_y, date, log_x=False, log_y=False):
-    df = df_country[df_country['date'] == date]
-    df = df[df['population'] > 1000000]
-    df['date'] = df['date'].astype(str)
+    df = country_cube.cross_section(
+        date, [measure_x, measure_y], min_population=1000000
+    )
+    df['date'] = str(pd.Timestamp(date))
     df[measure_x] = df[measure_x] + 1
     df[measure_y] = df[measure_y] + 1
     fig = px.scatter(
         df,
         x=measure_x,
         y=measure_y,
-        trendline='ols',
-        trendline_options=dict(log_x=log_x, log_y=log_y),
         hover_data={'country': True, 'date': True},
         log_x=log_x,
         log_y=log_y,
     )
+    line = trendline(scatter_trendlines, measure_x, measure_y, date, log_x, log_y)
+    if line is not None:
+        df = df.dropna(subset=[measure_x, measure_y])
+        fig.add_trace(
+            graph_trendline(line, df[measure_x], measure_x, measure_y, log_x, log_y)
+        )
+        fig.update_layout(
+            title=f'OLS trendline R<sup>2</sup> = {line["r_squared"]:.2f}'
+        )
     fig.update_layout(width=1000, height=400)
     return fig
 
 
-def main():
-
-    st.sidebar.markdown(
-        '''
-        ### About
-
-        The country analysis tool allows you to examine various COVID-19 metrics of any given country.
-
-        To get started, please select a country below.
-        '''
+# Draws a precomputed OLS trendline over the x values of a scatterplot
+@instrumented
+def graph_trendline(line, x, measure_x, measure_y, log_x=False, log_y=False):
+    x = np.sort(x.to_numpy(dtype='float64'))
+    label_x = f'log10({measure_x})' if log_x else measure_x
+    label_y = f'log10({measure_y})' if log_y else measure_y
+    return go.Scatter(
+        x=x,
+        y=predict(line, x, log_x, log_y),
+        mode='lines',
+        line=dict(color='#636efa'),
+        showlegend=False,
+        hovertemplate=(
+            '<b>OLS trendline</b><br>'
+            f'{label_y} = {line["slope"]:g} * {label_x} + {line["intercept"]:g}<br>'
+            f'R<sup>2</sup>={line["r_squared"]:f}<br><br>'
+            f'{measure_x}=%{{x}}<br>{measure_y}=%{{y}} <b>(trend)</b><extra></extra>'
+        ),
     )
 
-    country_select = st.sidebar.selectbox('Select a country', country_list)
-
-    st.title('COVID-19 Statistics by Country')
 
-    st.markdown(
-        '''
-        While COVID-19 can undoubtedly be defined as a global crisis, its impact has varied significantly across different countries. Below is a series of charts that examine various COVID-19 metrics at the country-level.
+# R^2 of a scatterplot's trendline on date
+@instrumented
+def scatter_r_squared(measure_x, measure_y, date, log_x=False, log_y=False):
+    line = trendline(scatter_trendlines, measure_x, measure_y, date, log_x, log_y)
+    return float('nan') if line is None else line['r_squared']
 
-        - **Note**: Due to inconsistencies in how different countries report COVID-19 data, some countries may be missing values and every existing metric is underreported. While we have attempted to minimize this by using techniques such as interpolation, there are inherent inaccuracies in this dataset.
-        - The dataset used can be viewed [here](https://github.com/jamesinjune/COVID_19_Data_Exploration/blob/main/visualization_data/covid_daily_country.zip).
-        '''
-    )
 
-    # General Metrics Section
+# Sections, each a fragment so that a widget in one only reruns that section
+@st.fragment
+@traced('general metrics', timings_requested, show_timings)
+def general_metrics_section(country_select, webgl):
     st.header('General Metrics')
 
     metric_select = st.selectbox('Select a metric', options=metric_list)
@@ -251,9 +534,13 @@ def main():
             '''
         )
         country_cases_fig = graph_area_country(
-            country_select, 'cases', '#6f6fe7', f'Total Cases: {country_select}'
+            country_select,
+            'cases',
+            '#6f6fe7',
+            f'Total Cases: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_cases_fig)
+        plotly_chart(country_cases_fig)
 
     if metric_select == 'Total Deaths':
         st.markdown(
@@ -262,9 +549,13 @@ def main():
             '''
         )
         country_deaths_fig = graph_area_country(
-            country_select, 'deaths', '#ec1342', f'Total Deaths: {country_select}'
+            country_select,
+            'deaths',
+            '#ec1342',
+            f'Total Deaths: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_deaths_fig)
+        plotly_chart(country_deaths_fig)
 
     if metric_select == 'Total Recoveries':
         st.markdown(
@@ -273,9 +564,13 @@ def main():
             '''
         )
         country_recovered_fig = graph_area_country(
-            country_select, 'recovered', '#11de57', f'Total Recoverys: {country_select}'
+            country_select,
+            'recovered',
+            '#11de57',
+            f'Total Recoverys: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_recovered_fig)
+        plotly_chart(country_recovered_fig)
 
     if metric_select == 'Total Active Cases':
         st.markdown(
@@ -284,9 +579,13 @@ def main():
             '''
         )
         country_active_fig = graph_area_country(
-            country_select, 'active', '#ff9c00', f'Total Active Cases: {country_select}'
+            country_select,
+            'active',
+            '#ff9c00',
+            f'Total Active Cases: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_active_fig)
+        plotly_chart(country_active_fig)
 
     if metric_select == 'Daily New Cases':
         st.markdown(
@@ -299,8 +598,9 @@ def main():
             'new_cases_smoothed',
             '#6f6fe7',
             f'Daily New Cases: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_new_cases_smoothed_fig)
+        plotly_chart(country_new_cases_smoothed_fig)
 
     if metric_select == 'Daily New Deaths':
         st.markdown(
@@ -313,8 +613,9 @@ def main():
             'new_deaths_smoothed',
             '#ec1342',
             f'Daily New Deaths: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_new_deaths_smoothed_fig)
+        plotly_chart(country_new_deaths_smoothed_fig)
 
     if metric_select == 'Daily New Recoveries':
         st.markdown(
@@ -327,8 +628,9 @@ def main():
             'new_recovered_smoothed',
             '#11de57',
             f'Daily New Recoveries: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_new_recovered_smoothed_fig)
+        plotly_chart(country_new_recovered_smoothed_fig)
 
     if metric_select == 'Cases Breakdown: Recoveries, Deaths, and Active Cases':
         st.markdown(
@@ -338,8 +640,10 @@ def main():
             each metric in relation to each other.
             '''
         )
-        country_case_stacked_fig = graph_stacked_country_case(country_select)
-        st.plotly_chart(country_case_stacked_fig)
+        country_case_stacked_fig = graph_stacked_country_case(
+            country_select, webgl=webgl
+        )
+        plotly_chart(country_case_stacked_fig)
 
     if metric_select == 'People Vaccinated':
         st.markdown(
@@ -353,8 +657,9 @@ def main():
             'people_vaccinated',
             '#6ad2e5',
             f'People Vaccinated: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_people_vaccinated_fig)
+        plotly_chart(country_people_vaccinated_fig)
 
     if metric_select == 'People Fully Vaccinated':
         st.markdown(
@@ -368,8 +673,9 @@ def main():
             'people_fully_vaccinated',
             '#6ad2e5',
             f'People Fully Vaccinated: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_people_fully_vaccinated_fig)
+        plotly_chart(country_people_fully_vaccinated_fig)
 
     if metric_select == 'Total Vaccinations':
         st.markdown(
@@ -383,8 +689,9 @@ def main():
             'total_vaccinations',
             '#6ad2e5',
             f'Total Vaccinations: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_total_vaccinations_fig)
+        plotly_chart(country_total_vaccinations_fig)
 
     if metric_select == 'Total Boosters':
         st.markdown(
@@ -398,8 +705,9 @@ def main():
             'total_boosters',
             '#6ad2e5',
             f'Total Boosters: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_total_boosters_fig)
+        plotly_chart(country_total_boosters_fig)
 
     if metric_select == 'Daily People Vaccinated':
         st.markdown(
@@ -413,8 +721,9 @@ def main():
             'daily_people_vaccinated',
             '#6ad2e5',
             f'Daily People Vaccinated: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_daily_people_vaccinated_fig)
+        plotly_chart(country_daily_people_vaccinated_fig)
 
     if metric_select == 'Daily People Fully Vaccinated':
         st.markdown(
@@ -427,8 +736,9 @@ def main():
             'daily_people_fully_vaccinated',
             '#6ad2e5',
             f'Daily People Fully Vaccinated: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_daily_people_fully_vaccinated_fig)
+        plotly_chart(country_daily_people_fully_vaccinated_fig)
 
     if metric_select == 'Daily Vaccinations':
         st.markdown(
@@ -441,8 +751,9 @@ def main():
             'daily_vaccinations',
             '#6ad2e5',
             f'Daily Vaccinations: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_daily_vaccinations_fig)
+        plotly_chart(country_daily_vaccinations_fig)
 
     if metric_select == 'Daily Boosters':
         st.markdown(
@@ -455,8 +766,9 @@ def main():
             'daily_boosters',
             '#6ad2e5',
             f'Daily Boosters: {country_select}',
+            webgl=webgl,
         )
-        st.plotly_chart(country_daily_boosters_fig)
+        plotly_chart(country_daily_boosters_fig)
 
     if metric_select == 'Stringency Index':
         st.markdown(
@@ -467,8 +779,12 @@ def main():
             '''
         )
         country_stringency_fig = graph_country_stringency(country_select)
-        st.plotly_chart(country_stringency_fig)
+        plotly_chart(country_stringency_fig)
+
 
+@st.fragment
+@traced('dual chart', timings_requested, show_timings)
+def dual_chart_section(country_select, webgl):
     st.markdown(
         'The plot below charts `new_cases_smoothed` alongside `stringency_value`.'
     )
@@ -478,11 +794,70 @@ def main():
         'new_cases_smoothed',
         'stringency_value',
         f'Comparing New Cases Smoothed and Stringency Index: {country_select}',
+        webgl=webgl,
+    )
+
+    plotly_chart(country_dual_fig)
+
+
+@st.fragment
+@traced('global rank', timings_requested, show_timings)
+def rank_section(country_select, webgl):
+    st.header('Global Rank')
+
+    rank_metric_select = st.selectbox(
+        'Select a rate',
+        options=list(rank_metric_list),
+        format_func=rank_metric_list.__getitem__,
+    )
+
+    st.markdown(
+        f'''
+        Where {country_select} ranked among all countries reporting a value on each date, with 1 being the highest. Hover over the line to see its percentile, the percentage of those countries with a lower value, counting {country_select} itself.
+        '''
+    )
+
+    country_rank_fig = graph_rank_country(
+        country_select, rank_metric_select, webgl=webgl
     )
+    plotly_chart(country_rank_fig)
 
-    st.plotly_chart(country_dual_fig)
 
-    # Top/Bottom 15 Countries by Metric Section
+@st.fragment
+@traced('regions', timings_requested, show_timings)
+def regions_section(country_select, webgl):
+    regions = region_index.get(country_select)
+    if not regions:
+        return
+
+    st.header('Regional Breakdown')
+
+    st.markdown(
+        f'''
+        {country_select} reports COVID-19 data by province or state. Select a region below, or {TOTAL_REGION} for the total of every region.
+        '''
+    )
+
+    region_select = st.selectbox('Select a region', options=regions)
+    region_metric_select = st.selectbox(
+        'Select a regional metric', options=list(region_metric_list)
+    )
+    measure, color = region_metric_list[region_metric_select]
+
+    region_fig = graph_area_region(
+        country_select,
+        region_select,
+        measure,
+        color,
+        f'{region_metric_select}: {region_select}, {country_select}',
+        webgl=webgl,
+    )
+    plotly_chart(region_fig)
+
+
+@st.fragment
+@traced('top/bottom countries', timings_requested, show_timings)
+def top_bottom_section():
     st.header('Visualizing Global COVID-19 Trends')
 
     st.markdown(
@@ -529,23 +904,34 @@ def main():
             }.__getitem__,
         )
 
-    min_date = df_country.dropna(subset=column_select)['date'].iloc[0]
-    max_date = df_country.dropna(subset=column_select)['date'].iloc[-1]
-
-    date_slider = st.slider(
-        'Select a date',
-        min_value=min_date.to_pydatetime(),
-        max_value=max_date.to_pydatetime(),
-        value=datetime(2021, 2, 22),
+    race_toggle = st.toggle(
+        'Play over time',
+        help='Plays the ranking week by week as a bar chart race, in the browser.',
     )
 
-    country_top_n_fig = graph_bar_country(
-        column_select, date_slider, is_top_n=is_top_n_radio
-    )
+    if race_toggle:
+        country_race_fig = graph_bar_race(column_select, is_top_n=is_top_n_radio)
+        plotly_chart(country_race_fig)
+    else:
+        min_date, max_date = country_coverage.date_range(column_select)
 
-    st.plotly_chart(country_top_n_fig)
+        date_slider = st.slider(
+            'Select a date',
+            min_value=min_date.to_pydatetime(),
+            max_value=max_date.to_pydatetime(),
+            value=datetime(2021, 2, 22),
+        )
+
+        country_top_n_fig = graph_bar_country(
+            column_select, date_slider, is_top_n=is_top_n_radio
+        )
 
-    # Scatterplots Section
+        plotly_chart(country_top_n_fig)
+
+
+@st.fragment
+@traced('scatterplots', timings_requested, show_timings)
+def scatterplots_section():
     scatterplot_list = [
         'HDI vs. Case Fatality Rate',
         'HDI vs. Infection Rate',
@@ -566,8 +952,7 @@ def main():
     scatterplot_select = st.selectbox('Select a scatterplot', options=scatterplot_list)
 
     if scatterplot_select == 'HDI vs. Case Fatality Rate':
-        min_date_scatter = df_country.dropna(subset='hdi_value')['date'].iloc[0]
-        max_date_scatter = df_country.dropna(subset='hdi_value')['date'].iloc[-1]
+        min_date_scatter, max_date_scatter = country_coverage.date_range('hdi_value')
         date_slider_scatter = st.slider(
             'Select a date',
             min_value=min_date_scatter.to_pydatetime(),
@@ -582,8 +967,8 @@ def main():
             log_y=True,
         )
         hdi_dist_fig = hdi_dist(date_slider_scatter)
-        st.plotly_chart(hdi_case_fatality_scatter_fig)
-        st.plotly_chart(hdi_dist_fig)
+        plotly_chart(hdi_case_fatality_scatter_fig)
+        plotly_chart(hdi_dist_fig)
         st.markdown(
             '''
             #### Explanation: HDI vs. Case Fatality Rate
@@ -596,8 +981,7 @@ def main():
         )
 
     if scatterplot_select == 'HDI vs. Infection Rate':
-        min_date_scatter = df_country.dropna(subset='hdi_value')['date'].iloc[0]
-        max_date_scatter = df_country.dropna(subset='hdi_value')['date'].iloc[-1]
+        min_date_scatter, max_date_scatter = country_coverage.date_range('hdi_value')
         date_slider_scatter = st.slider(
             'Select a date',
             min_value=min_date_scatter.to_pydatetime(),
@@ -608,25 +992,25 @@ def main():
             'hdi_value', 'infection_rate', date_slider_scatter, log_x=False, log_y=True
         )
         hdi_dist_fig = hdi_dist(date_slider_scatter)
-        st.plotly_chart(hdi_case_fatality_scatter_fig)
-        st.plotly_chart(hdi_dist_fig)
+        plotly_chart(hdi_case_fatality_scatter_fig)
+        plotly_chart(hdi_dist_fig)
+        r_squared_end_2022 = scatter_r_squared(
+            'hdi_value', 'infection_rate', datetime(2022, 12, 31), log_y=True
+        )
         st.markdown(
-            '''
+            f'''
             #### Explanation: HDI vs. Infection Rate
             As HDI increases linearly, we see a strong, positive, exponential growth in infection rate throughout all stages of the 
-            pandemic. In fact, the correlation seems to grow stronger as the pandemic progresses, with an $R^2$ value of 0.79 by the 
+            pandemic. In fact, the correlation seems to grow stronger as the pandemic progresses, with an $R^2$ value of {r_squared_end_2022:.2f} by the 
             end of 2022. Essentially, this means that countries that are more developed generally experience exponentially higher infection 
             rates, and this statement becomes increasingly accurate the further along in the pandemic we are.
             '''
         )
 
     if scatterplot_select == 'People Vaccinated Rate vs. Infection Rate':
-        min_date_scatter = df_country.dropna(subset='people_vaccinated_rate')[
-            'date'
-        ].iloc[0]
-        max_date_scatter = df_country.dropna(subset='people_vaccinated_rate')[
-            'date'
-        ].iloc[-1]
+        min_date_scatter, max_date_scatter = country_coverage.date_range(
+            'people_vaccinated_rate'
+        )
         date_slider_scatter = st.slider(
             'Select a date',
             min_value=min_date_scatter.to_pydatetime(),
@@ -640,7 +1024,7 @@ def main():
             log_x=False,
             log_y=True,
         )
-        st.plotly_chart(hdi_case_fatality_scatter_fig)
+        plotly_chart(hdi_case_fatality_scatter_fig)
         st.markdown(
             '''
             #### Explanation: Vaccination Rates vs. Infection Rate
@@ -656,12 +1040,9 @@ def main():
         )
 
     if scatterplot_select == 'Fully Vaccinated Rate vs. Infection Rate':
-        min_date_scatter = df_country.dropna(subset='fully_vaccinated_rate')[
-            'date'
-        ].iloc[0]
-        max_date_scatter = df_country.dropna(subset='fully_vaccinated_rate')[
-            'date'
-        ].iloc[-1]
+        min_date_scatter, max_date_scatter = country_coverage.date_range(
+            'fully_vaccinated_rate'
+        )
         date_slider_scatter = st.slider(
             'Select a date',
             min_value=min_date_scatter.to_pydatetime(),
@@ -675,7 +1056,7 @@ def main():
             log_x=False,
             log_y=True,
         )
-        st.plotly_chart(hdi_case_fatality_scatter_fig)
+        plotly_chart(hdi_case_fatality_scatter_fig)
         st.markdown(
             '''
             #### Explanation: Vaccination Rates vs. Infection Rate
@@ -691,5 +1072,47 @@ def main():
         )
 
 
+def main():
+
+    st.sidebar.markdown(
+        '''
+        ### About
+
+        The country analysis tool allows you to examine various COVID-19 metrics of any given country.
+
+        To get started, please select a country below.
+        '''
+    )
+
+    country_select = st.sidebar.selectbox('Select a country', country_list)
+
+    webgl = st.sidebar.toggle(
+        'Fast charts',
+        help='Draws long series with fewer points, in WebGL, for slow connections and devices.',
+    )
+
+    st.title('COVID-19 Statistics by Country')
+
+    st.markdown(
+        '''
+        While COVID-19 can undoubtedly be defined as a global crisis, its impact has varied significantly across different countries. Below is a series of charts that examine various COVID-19 metrics at the country-level.
+
+        - **Note**: Due to inconsistencies in how different countries report COVID-19 data, some countries may be missing values and every existing metric is underreported. While we have attempted to minimize this by using techniques such as interpolation, there are inherent inaccuracies in this dataset.
+        - The dataset used can be viewed [here](https://github.com/jamesinjune/COVID_19_Data_Exploration/blob/main/visualization_data/covid_daily_country.zip).
+        '''
+    )
+
+    general_metrics_section(country_select, webgl)
+    dual_chart_section(country_select, webgl)
+    regions_section(country_select, webgl)
+    rank_section(country_select, webgl)
+    top_bottom_section()
+    scatterplots_section()
+
+    trace = finish_trace()
+    if trace is not None and timings_requested():
+        show_timings(trace, st.sidebar)
+
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,90 @@
+import json
+import threading
+
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pandas as pd
+import pytest
+
+from covid_data import api
+
+
+@pytest.fixture
+def server(monkeypatch):
+    glob = pd.DataFrame(
+        {
+            'date': pd.date_range('2021-12-30', periods=5),
+            'cases': [1.0, 2.0, 3.0, 4.0, 5.0],
+        }
+    )
+    monkeypatch.setattr(api, 'load_global', lambda: glob)
+    monkeypatch.setattr(api, 'data_version', lambda: 'test')
+
+    server = api.make_server(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def get(url, headers=None):
+    try:
+        with urlopen(Request(url, headers=headers or {})) as response:
+            return response.status, response.headers, response.read()
+    except HTTPError as error:
+        return error.code, error.headers, error.read()
+
+
+def test_utc_dates(server):
+    status, _, body = get(f'{server}/global?start=2022-01-01T00:00Z')
+    assert status == 200
+    dates = [row['date'] for row in json.loads(body)]
+    assert dates == ['2022-01-01', '2022-01-02', '2022-01-03']
+
+    status, _, body = get(f'{server}/global?end=2022-01-01T01:00-02:00')
+    assert status == 200
+    assert json.loads(body)[-1]['date'] == '2022-01-01'
+
+
+def test_internal_error(server, monkeypatch):
+    def fail(query):
+        raise RuntimeError('boom')
+
+    monkeypatch.setitem(api.ROUTES, '/global', fail)
+    status, _, body = get(f'{server}/global')
+    assert status == 500
+    assert json.loads(body) == {'error': 'internal server error'}
+
+
+def test_not_modified(server):
+    status, headers, body = get(f'{server}/global?metric=cases')
+    assert status == 200 and body
+
+    etag = headers['ETag']
+    status, headers, body = get(
+        f'{server}/global?metric=cases', {'If-None-Match': etag}
+    )
+    assert status == 304
+    assert headers['ETag'] == etag
+    assert body == b''
+
+
+def test_etag_ignores_parameter_order(server):
+    _, first, _ = get(f'{server}/global?start=2022-01-01&metric=cases')
+    _, second, _ = get(f'{server}/global?metric=cases&start=2022-01-01')
+    _, other, _ = get(f'{server}/global?metric=cases&start=2022-01-02')
+    assert first['ETag'] == second['ETag']
+    assert first['ETag'] != other['ETag']
+
+
+def test_response_cache(server, monkeypatch):
+    calls = []
+    load_global = api.load_global
+    monkeypatch.setattr(api, 'load_global', lambda: calls.append(1) or load_global())
+
+    _, _, first = get(f'{server}/global?metric=cases&format=csv')
+    _, _, second = get(f'{server}/global?format=csv&metric=cases')
+    assert first == second
+    assert len(calls) == 1
@@ -0,0 +1,160 @@
+import shutil
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_etl import sources
+from covid_etl.build import RAW_DIR, SOURCES, build
+from covid_etl.incremental import JHU_TABLES, build_incremental
+from covid_etl.names import CountryNames
+
+COUNTRIES = ['Australia', 'Canada', 'Germany', 'Italy']
+NEW_COUNTRY = 'Japan'
+ALL_COUNTRIES = [*COUNTRIES, NEW_COUNTRY]
+ISO_CODES = {
+    'Australia': 'AUS',
+    'Canada': 'CAN',
+    'Germany': 'DEU',
+    'Italy': 'ITA',
+    'Japan': 'JPN',
+}
+
+# Date columns of the raw JHU files kept in the first build, and up to which
+# the second build reads them
+START, FIRST_STOP, LAST_STOP = 300, 330, 340
+
+
+# The JHU rows of the fixture countries, as strings so that they are written
+# back unchanged
+@pytest.fixture(scope='module')
+def jhu():
+    tables = {}
+    for name in JHU_TABLES:
+        df = pd.read_csv(RAW_DIR / SOURCES[name][1], dtype=str, keep_default_na=False)
+        tables[name] = df[df['Country/Region'].isin(ALL_COUNTRIES)]
+    return tables
+
+
+# A raw directory with every source cut down to the fixture countries, and a
+# names table of its own
+@pytest.fixture
+def raw_dir(tmp_path, monkeypatch):
+    raw_dir = tmp_path / 'raw'
+    raw_dir.mkdir()
+    for name in ['human_development_index', 'population']:
+        shutil.copy(RAW_DIR / SOURCES[name][1], raw_dir)
+
+    file_name = SOURCES['stringency_index'][1]
+    df = pd.read_csv(RAW_DIR / file_name, dtype=str, keep_default_na=False)
+    df = df[df['country_name'].isin(ALL_COUNTRIES)]
+    df.to_csv(raw_dir / file_name, index=False)
+
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2020-12-15', '2021-01-10')
+    rows = []
+    for country, iso_code in ISO_CODES.items():
+        totals = np.cumsum(rng.integers(0, 1000, (len(dates), 4)), axis=0)
+        totals = totals.astype('float64')
+        totals[rng.random(totals.shape) < 0.2] = np.nan
+        for date, values in zip(dates, totals):
+            rows.append((country, iso_code, f'{date:%Y-%m-%d}', *values))
+    df = pd.DataFrame(
+        rows, columns=['location', 'iso_code', 'date', *sources.VACCINATION_TOTALS]
+    )
+    df['daily_vaccinations'] = rng.integers(0, 1000, len(df))
+    df['daily_people_vaccinated'] = rng.integers(0, 1000, len(df))
+    df.to_csv(raw_dir / SOURCES['covid_vaccinations'][1], index=False)
+
+    names = CountryNames(tmp_path / 'country_names.csv')
+    monkeypatch.setattr(sources, 'country_names', lambda: names)
+    return raw_dir
+
+
+def write_jhu(raw_dir, tables, stop, countries):
+    for name, df in tables.items():
+        df = df[df['Country/Region'].isin(countries)]
+        df = df[[*df.columns[:4], *df.columns[4 + START : 4 + stop]]]
+        df.to_csv(raw_dir / SOURCES[name][1], index=False)
+
+
+# Runs a full build of the first dates, then build_incremental once the JHU
+# tables have been rewritten up to LAST_STOP, and a full build of the same raw
+# data to compare it with. Returns the notes of build_incremental
+def build_both(tmp_path, raw_dir, first, last, first_countries=ALL_COUNTRIES):
+    write_jhu(raw_dir, first, FIRST_STOP, first_countries)
+    build(raw_dir, tmp_path / 'out', state_dir=tmp_path / 'state', workers=1)
+
+    write_jhu(raw_dir, last, LAST_STOP, ALL_COUNTRIES)
+    timings = build_incremental(
+        raw_dir, tmp_path / 'out', state_dir=tmp_path / 'state', workers=1
+    )
+    build(raw_dir, tmp_path / 'full', state_dir=tmp_path / 'full_state', workers=1)
+    assert_same_outputs(tmp_path / 'out', tmp_path / 'full')
+    return timings.notes
+
+
+def assert_same_outputs(output_dir, expected_dir):
+    for name in ['covid_daily_global.csv']:
+        assert (output_dir / name).read_text() == (expected_dir / name).read_text()
+
+    name = 'covid_daily_country.zip'
+    with zipfile.ZipFile(output_dir / name) as a, zipfile.ZipFile(
+        expected_dir / name
+    ) as b:
+        assert a.read('covid_daily_country.csv') == b.read('covid_daily_country.csv')
+
+    for name in ['country', 'rank', 'region']:
+        name = f'covid_daily_{name}.parquet'
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(output_dir / name), pd.read_parquet(expected_dir / name)
+        )
+
+    with np.load(output_dir / 'covid_daily_map.npz') as a, np.load(
+        expected_dir / 'covid_daily_map.npz'
+    ) as b:
+        assert sorted(a) == sorted(b)
+        for key in a:
+            np.testing.assert_array_equal(a[key], b[key])
+
+
+def test_appended_dates(tmp_path, raw_dir, jhu):
+    notes = build_both(tmp_path, raw_dir, jhu, jhu)
+    date = pd.to_datetime(jhu['covid_cases'].columns[4 + FIRST_STOP], format='%m/%d/%y')
+    assert notes == [f'incremental build from {date:%Y-%m-%d}']
+
+
+def test_revised_values(tmp_path, raw_dir, jhu):
+    last = dict(jhu)
+    df = last['covid_cases'].copy()
+    column = df.columns[4 + FIRST_STOP - 1]
+    row = df['Country/Region'] == 'Germany'
+    df.loc[row, column] = str(int(df.loc[row, column].iloc[0]) + 1000)
+    last['covid_cases'] = df
+
+    notes = build_both(tmp_path, raw_dir, jhu, last)
+    assert notes[-1].startswith('covid_cases: values for')
+    assert notes[-1].endswith('were revised, ran a full build')
+
+
+def test_new_country(tmp_path, raw_dir, jhu):
+    notes = build_both(tmp_path, raw_dir, jhu, jhu, COUNTRIES)
+    assert (
+        notes[-1] == f"covid_cases: new countries ['{NEW_COUNTRY}'], ran a full build"
+    )
+
+
+def test_new_negative_recovered(tmp_path, raw_dir, jhu):
+    last = dict(jhu)
+    df = last['covid_recovered'].copy()
+    row = df['Country/Region'] == 'Germany'
+    df.loc[row, df.columns[4 + LAST_STOP - 1]] = '-1'
+    last['covid_recovered'] = df
+
+    notes = build_both(tmp_path, raw_dir, jhu, last)
+    file_name = SOURCES['covid_recovered'][1]
+    assert notes[-1] == (
+        f'{file_name}: new negative values drop rows from earlier dates, '
+        'ran a full build'
+    )
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from covid_etl.repair import mask_inflated, mask_inflated_scan
+from covid_etl.transform import group_bounds
+
+nan = np.nan
+
+COUNTRIES = {
+    'leading nan': [nan, nan, 1, 5, 3, 4],
+    'trailing nan': [1, 2, 9, 3, nan, nan],
+    'nan between spikes': [1, 8, nan, 2, 9, 3],
+    'repeated spikes': [1, 5, 2, 6, 3, 9, 4, 4, 10, 5],
+    'spike over several rows': [1, 2, 9, 8, 9, 3, 4],
+    'ties': [1, 3, 3, 2, 2, 5],
+    'single row': [7],
+    'all nan': [nan, nan],
+}
+
+
+# The notebook's scan, run on each country on its own
+def scan_by_country(keys, values):
+    masks = []
+    for key in dict.fromkeys(keys):
+        masks.append(mask_inflated_scan(values[keys == key]))
+    return np.concatenate(masks)
+
+
+def vectorized(keys, values):
+    start, _ = group_bounds(keys)
+    return mask_inflated(values, start)
+
+
+@pytest.mark.parametrize('name', COUNTRIES)
+def test_single_country(name):
+    values = np.array(COUNTRIES[name], dtype='float64')
+    keys = np.zeros(len(values), dtype=int)
+    np.testing.assert_array_equal(
+        vectorized(keys, values), scan_by_country(keys, values)
+    )
+
+
+# Countries back to back, so that a drop at the start of one country must not
+# flag the end of the previous one
+def test_countries_together():
+    keys = np.repeat(np.arange(len(COUNTRIES)), [len(v) for v in COUNTRIES.values()])
+    values = np.concatenate([np.array(v, dtype='float64') for v in COUNTRIES.values()])
+    np.testing.assert_array_equal(
+        vectorized(keys, values), scan_by_country(keys, values)
+    )
+
+
+def test_random_series():
+    rng = np.random.default_rng(0)
+    keys = np.sort(rng.integers(0, 40, 2000))
+    values = np.cumsum(rng.integers(0, 5, 2000)).astype('float64')
+    spikes = rng.random(2000) < 0.05
+    values[spikes] += rng.integers(1, 50, spikes.sum())
+    values[rng.random(2000) < 0.03] = nan
+    np.testing.assert_array_equal(
+        vectorized(keys, values), scan_by_country(keys, values)
+    )
+
+
+def test_empty():
+    assert len(mask_inflated(np.zeros(0), np.zeros(0, dtype=int))) == 0